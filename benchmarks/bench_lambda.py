@@ -0,0 +1,293 @@
+"""
+Offline load test for the AskforRecipe lambda.
+
+Loads a RecipeNLG sample csv into an in-memory DynamoDB stand-in, replays
+synthetic Lex V2 fulfillment events with Zipf distributed keyword popularity
+and reports latency percentiles, round trips per request and memory. Every
+worker process plays one warm lambda container.
+
+    python benchmarks/bench_lambda.py --csv sample.csv --requests 2000 \\
+        --concurrency 4 --output benchmarks/results/baseline.json
+    python benchmarks/bench_lambda.py --csv sample.csv --compare \\
+        benchmarks/results/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "lambda_update_dynamodb"))
+
+import dietary_rules  # noqa: E402
+from fake_dynamodb import FakeDynamoDBClient  # noqa: E402
+
+# metrics compared against a baseline, lower is better for all of them
+COMPARED_METRICS = [
+    ("latency_ms", "p50"),
+    ("latency_ms", "p95"),
+    ("latency_ms", "p99"),
+    ("round_trips", "mean"),
+    ("pages_read", "mean"),
+    ("memory_mb", "max_rss"),
+]
+
+_worker = {}
+
+
+def load_corpus(client, table_name, keyword_table_name, csv_path, limit):
+    """
+    fill the stand-in tables the same way importcsv.py and createKeywords.py do
+    """
+    import createKeywords
+    import importcsv
+
+    recipes = client.create_table(table_name, "Id")
+    keywords = client.create_table(
+        keyword_table_name, "Id", {"keywords-index": "keywords"}
+    )
+    count = 0
+    with importcsv.open_local_lines(csv_path) as lines:
+        for recipe in importcsv.iter_recipes(lines):
+            if limit and count >= limit:
+                break
+            recipes.put(recipe)
+            for posting in createKeywords.keyword_items(recipe):
+                keywords.put(posting)
+            count += 1
+    return keywords
+
+
+def init_worker(config, cache_root=None):
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    os.environ.setdefault("PREWARM_CONNECTIONS", "false")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # every worker stands for one container, with a /tmp cache of its own
+    os.environ["RECIPE_CACHE_DIR"] = tempfile.mkdtemp(dir=cache_root)
+    if config["no_cache"]:
+        os.environ["QUERY_CACHE_SIZE"] = "0"
+
+    import lambda_function_askforrecipe as handler
+    import request_metrics
+
+    client = FakeDynamoDBClient(config["latency_ms"])
+    load_corpus(
+        client,
+        handler.TABLE_NAME,
+        handler.KEYWORD_TABLE_NAME,
+        config["csv"],
+        config["recipes"],
+    )
+    handler.dynamodb_client = client
+
+    records = []
+    request_metrics.set_sink(records.append)
+    _worker.update(
+        handler=handler,
+        client=client,
+        records=records,
+        loaded_rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    )
+
+
+def run_batch(events):
+    handler = _worker["handler"]
+    client = _worker["client"]
+    records = _worker["records"]
+    samples = []
+    started = time.time()
+    for event in events:
+        calls = client.calls
+        records.clear()
+        request_started = time.perf_counter()
+        handler.lambda_handler(event, None)
+        latency = (time.perf_counter() - request_started) * 1000
+        pages = sum(r.get("pages_read", 0) for r in records)
+        samples.append((latency, client.calls - calls, pages))
+    return {
+        "samples": samples,
+        "started": started,
+        "finished": time.time(),
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "loaded_rss_kb": _worker["loaded_rss"],
+    }
+
+
+def keyword_popularity(csv_path, recipes, vocabulary):
+    """
+    the most common title keywords, most popular first, with a few words that
+    appear next to each of them for descriptors and flavors
+    """
+    import importcsv
+    from recipe_keywords import split_keywords
+
+    counts = {}
+    neighbours = {}
+    with importcsv.open_local_lines(csv_path) as lines:
+        for n, recipe in enumerate(importcsv.iter_recipes(lines)):
+            if recipes and n >= recipes:
+                break
+            keywords = split_keywords(recipe["title"])
+            for keyword in keywords:
+                counts[keyword] = counts.get(keyword, 0) + 1
+                others = neighbours.setdefault(keyword, [])
+                if len(others) < 20:
+                    others.extend(k for k in keywords if k != keyword)
+    ranked = sorted(counts, key=counts.get, reverse=True)[:vocabulary]
+    return ranked, neighbours
+
+
+def slot(value):
+    return {"value": {"interpretedValue": value}}
+
+
+def make_events(ranked, neighbours, count, zipf, seed):
+    rng = random.Random(seed)
+    weights = [1 / (rank**zipf) for rank in range(1, len(ranked) + 1)]
+    restrictions = ["none"] * 6 + list(dietary_rules.RESTRICTIONS)
+    events = []
+    for n in range(count):
+        keyword = rng.choices(ranked, weights)[0]
+        others = neighbours.get(keyword) or ["any"]
+        item = keyword
+        if rng.random() < 0.3:
+            item = f"{rng.choice(others)} {keyword}"
+        flavor = "any" if rng.random() < 0.6 else rng.choice(others)
+        events.append(
+            {
+                "sessionId": f"bench-{n}",
+                "invocationSource": "FulfillmentCodeHook",
+                "sessionState": {
+                    "sessionAttributes": {},
+                    "intent": {
+                        "name": "AskforRecipe",
+                        "slots": {
+                            "Item": slot(item),
+                            "Flavor": slot(flavor),
+                            "DietaryRestrictions": slot(rng.choice(restrictions)),
+                        },
+                    },
+                },
+            }
+        )
+    return events
+
+
+def percentiles(values):
+    if len(values) < 2:
+        value = values[0] if values else 0.0
+        return {"p50": value, "p95": value, "p99": value, "mean": value, "max": value}
+    cuts = statistics.quantiles(values, n=100)
+    return {
+        "p50": round(cuts[49], 3),
+        "p95": round(cuts[94], 3),
+        "p99": round(cuts[98], 3),
+        "mean": round(statistics.fmean(values), 3),
+        "max": round(max(values), 3),
+    }
+
+
+def run(config):
+    ranked, neighbours = keyword_popularity(
+        config["csv"], config["recipes"], config["vocabulary"]
+    )
+    events = make_events(
+        ranked, neighbours, config["requests"], config["zipf"], config["seed"]
+    )
+    workers = config["concurrency"]
+    batches = [events[i::workers] for i in range(workers)]
+    warmup = [batch[: config["warmup"]] for batch in batches]
+    measured = [batch[config["warmup"] :] for batch in batches]
+
+    with tempfile.TemporaryDirectory(prefix="recipebot-bench-") as cache_root:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=init_worker, initargs=(config, cache_root)
+        ) as executor:
+            list(executor.map(run_batch, warmup))
+            results = list(executor.map(run_batch, measured))
+
+    samples = [s for r in results for s in r["samples"]]
+    elapsed = max(r["finished"] for r in results) - min(r["started"] for r in results)
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": config,
+        "requests": len(samples),
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": percentiles([s[0] for s in samples]),
+        "round_trips": percentiles([s[1] for s in samples]),
+        "pages_read": percentiles([s[2] for s in samples]),
+        "memory_mb": {
+            "max_rss": round(max(r["max_rss_kb"] for r in results) / 1024, 1),
+            "after_load_rss": round(max(r["loaded_rss_kb"] for r in results) / 1024, 1),
+        },
+    }
+
+
+def compare(result, baseline, tolerance):
+    """
+    print each compared metric next to the baseline, returns the regressions
+    """
+    regressions = []
+    for group, name in COMPARED_METRICS:
+        old = baseline.get(group, {}).get(name)
+        new = result[group][name]
+        if old is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(f"{group}.{name}")
+        print(f"{group}.{name}: {old} -> {new} ({change:+.1f}%){flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the AskforRecipe lambda")
+    parser.add_argument("--csv", required=True, help="RecipeNLG sample csv")
+    parser.add_argument("--recipes", type=int, default=0, help="load at most n rows")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=5, help="per worker")
+    parser.add_argument("--zipf", type=float, default=1.1)
+    parser.add_argument("--vocabulary", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--output", help="write the result json here")
+    parser.add_argument("--compare", help="baseline result json to compare with")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    config = {
+        "csv": args.csv,
+        "recipes": args.recipes,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "warmup": args.warmup,
+        "zipf": args.zipf,
+        "vocabulary": args.vocabulary,
+        "latency_ms": args.latency_ms,
+        "seed": args.seed,
+        "no_cache": args.no_cache,
+    }
+    result = run(config)
+    print(json.dumps(result, indent=2))
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
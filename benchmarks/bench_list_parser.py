@@ -0,0 +1,132 @@
+"""
+Throughput of the parsers for the RecipeNLG list columns.
+
+Reads the ingredients, directions and NER columns of a RecipeNLG csv and times
+every way importcsv.py could turn them into lists: the old comma split,
+json.loads and ast.literal_eval per field, and listParser.py field by field and
+in bulk. Results are checked against ast.literal_eval, so the report also shows
+how many fields each parser gets wrong.
+
+    python benchmarks/bench_list_parser.py --csv RecipeNLG_dataset.csv
+"""
+import argparse
+import ast
+import csv
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "lambda_update_dynamodb"))
+
+import listParser  # noqa: E402
+
+LIST_FIELDS = ["ingredients", "directions", "NER"]
+
+csv.field_size_limit(2**31 - 1)
+
+
+def split_list(value):
+    # the parser importcsv.py used before listParser.py
+    return [x.strip().strip('"') for x in value.strip("][").split(",")]
+
+
+def safe(parse):
+    def parse_or_none(value):
+        try:
+            return parse(value)
+        except (ValueError, SyntaxError):
+            return None
+
+    return parse_or_none
+
+
+def per_field(parse):
+    return lambda values: [parse(value) for value in values]
+
+
+def bulk(chunk_size):
+    def parse(values):
+        parsed = []
+        for start in range(0, len(values), chunk_size):
+            parsed += listParser.parse_lists(values[start : start + chunk_size])
+        return parsed
+
+    return parse
+
+
+def load_fields(path, limit):
+    """
+    the list column values of the first limit rows, column after column
+    """
+    columns = {field: [] for field in LIST_FIELDS}
+    rows = 0
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if limit and rows >= limit:
+                break
+            rows += 1
+            for field in LIST_FIELDS:
+                if row.get(field) is not None:
+                    columns[field].append(row[field])
+    return rows, columns
+
+
+def run(parse, columns, repeat):
+    """
+    best of repeat wall times for parsing every column, and the parsed values
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parsed = {field: parse(values) for field, values in columns.items()}
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, parsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", required=True, help="RecipeNLG csv to read")
+    parser.add_argument(
+        "--limit", type=int, default=0, help="only read this many rows, 0 for all"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="runs per parser, the best is kept"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=listParser.DEFAULT_CHUNK_SIZE,
+        help="fields per json document in bulk mode",
+    )
+    args = parser.parse_args()
+
+    rows, columns = load_fields(args.csv, args.limit)
+    fields = sum(len(values) for values in columns.values())
+    parsers = [
+        ("split", per_field(split_list)),
+        ("ast.literal_eval", per_field(safe(ast.literal_eval))),
+        ("json.loads", per_field(safe(json.loads))),
+        ("scan_list", per_field(listParser.scan_list)),
+        ("parse_list", per_field(listParser.parse_list)),
+        ("parse_lists", bulk(args.chunk_size)),
+    ]
+
+    _, expected = run(per_field(safe(ast.literal_eval)), columns, 1)
+    print(f"{rows} rows, {fields} fields")
+    print(f"{'parser':<18}{'seconds':>10}{'rows/s':>12}{'wrong fields':>14}")
+    for name, parse in parsers:
+        elapsed, parsed = run(parse, columns, args.repeat)
+        wrong = sum(
+            got != want
+            for field in LIST_FIELDS
+            for got, want in zip(parsed[field], expected[field])
+        )
+        rate = rows / elapsed if elapsed else float("inf")
+        print(f"{name:<18}{elapsed:>10.3f}{rate:>12.0f}{wrong:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+In-memory stand-in for the low-level DynamoDB client used by the chatbot lambda.
+
+Items are stored in the same typed format the real client returns, pagination
+follows Limit/ExclusiveStartKey, and every call is counted, from any thread, so
+the benchmark can report round trips per request. An optional fixed latency per
+call approximates network time to DynamoDB.
+"""
+import re
+import threading
+import time
+
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
+
+_serializer = TypeSerializer()
+_deserializer = TypeDeserializer()
+_contains = re.compile(r"contains\((\w+),\s*(:\w+)\)")
+
+
+def to_dynamodb(item):
+    return {key: _serializer.serialize(value) for key, value in item.items()}
+
+
+def from_dynamodb(item):
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def compile_filter(expression, values):
+    """
+    turn "contains(attr, :v) AND ..." into a predicate over typed items
+    """
+    conditions = []
+    for condition in expression.split(" AND "):
+        match = _contains.fullmatch(condition.strip())
+        if not match:
+            raise NotImplementedError(f"unsupported filter {condition!r}")
+        attribute, placeholder = match.groups()
+        conditions.append((attribute, _deserializer.deserialize(values[placeholder])))
+
+    def matches(item):
+        for attribute, value in conditions:
+            if attribute not in item:
+                return False
+            if value not in _deserializer.deserialize(item[attribute]):
+                return False
+        return True
+
+    return matches
+
+
+class FakeTable:
+    def __init__(self, key, indexes=None):
+        self.key = key
+        self.items = {}
+        # index name -> partition attribute, partition value -> ordered keys
+        self.indexes = dict(indexes or {})
+        self.partitions = {name: {} for name in self.indexes}
+
+    def put(self, item):
+        typed = to_dynamodb(item)
+        key = item[self.key]
+        if key not in self.items:
+            for name, attribute in self.indexes.items():
+                if attribute in item:
+                    partition = self.partitions[name].setdefault(item[attribute], [])
+                    partition.append(key)
+        self.items[key] = typed
+
+
+class FakeDynamoDBClient:
+    def __init__(self, latency_ms=0.0):
+        self.tables = {}
+        self.latency = latency_ms / 1000
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def create_table(self, name, key, indexes=None):
+        self.tables[name] = FakeTable(key, indexes)
+        return self.tables[name]
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def describe_table(self, TableName):
+        self._call()
+        return {"Table": {"TableName": TableName, "ItemCount": 0}}
+
+    def get_item(self, TableName, Key, **kwargs):
+        self._call()
+        table = self.tables[TableName]
+        item = table.items.get(_deserializer.deserialize(Key[table.key]))
+        return {"Item": item} if item else {}
+
+    def batch_get_item(self, RequestItems):
+        self._call()
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.tables[name]
+            if len(request["Keys"]) > 100:
+                raise ValueError("Too many items requested for the BatchGetItem call")
+            keys = [_deserializer.deserialize(k[table.key]) for k in request["Keys"]]
+            responses[name] = [table.items[key] for key in keys if key in table.items]
+        return {"Responses": responses, "UnprocessedKeys": {}}
+
+    def query(
+        self,
+        TableName,
+        IndexName,
+        KeyConditionExpression,
+        ExpressionAttributeValues,
+        Limit=None,
+        ExclusiveStartKey=None,
+        **kwargs,
+    ):
+        """
+        supports the "attribute = :value" key conditions and contains() filters
+        the lambda uses. like DynamoDB, Limit counts items before the filter
+        """
+        self._call()
+        table = self.tables[TableName]
+        attribute, placeholder = [p.strip() for p in KeyConditionExpression.split("=")]
+        if table.indexes[IndexName] != attribute:
+            raise ValueError(f"{IndexName} is not keyed on {attribute}")
+        value = _deserializer.deserialize(ExpressionAttributeValues[placeholder])
+        keys = table.partitions[IndexName].get(value, [])
+
+        start = 0
+        if ExclusiveStartKey:
+            last = _deserializer.deserialize(ExclusiveStartKey[table.key])
+            start = keys.index(last) + 1
+        end = len(keys) if Limit is None else start + Limit
+        page = keys[start:end]
+
+        items = [table.items[key] for key in page]
+        if kwargs.get("FilterExpression"):
+            matches = compile_filter(
+                kwargs["FilterExpression"], ExpressionAttributeValues
+            )
+            items = [item for item in items if matches(item)]
+        response = {"Items": items, "Count": len(items), "ScannedCount": len(page)}
+        if end < len(keys):
+            response["LastEvaluatedKey"] = {
+                table.key: _serializer.serialize(page[-1]),
+                attribute: _serializer.serialize(value),
+            }
+        return response
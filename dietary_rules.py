@@ -0,0 +1,247 @@
+"""
+Dietary restriction rules for the recipe chatbot.
+
+Each restriction is a set of banned NER ingredients. The sets are normalized and
+frozen once at import, so checking a recipe is a single set lookup per NER
+entry no matter how many restrictions are combined.
+
+The ingest scripts also tag every recipe with a bitmask of the restrictions it
+satisfies, so the chatbot can ask DynamoDB for compatible recipes only.
+"""
+import re
+from functools import lru_cache
+
+RESTRICTIONS = {
+    "gluten free": [
+        "bread",
+        "pasta",
+        "cereal",
+        "crackers",
+        "beer",
+        "gravy",
+        "ale",
+        "wheat",
+        "cookies",
+    ],
+    "nuts free": [
+        "almonds",
+        "walnuts",
+        "pecans",
+        "cashews",
+        "hazelnuts",
+        "peanuts",
+        "macadamia nuts",
+        "pine nuts",
+        "brazil nuts",
+        "pistachios",
+        "butternuts",
+    ],
+    "vegan": [
+        "eggs",
+        "egg",
+        "cheese",
+        "milk",
+        "ice cream",
+        "honey",
+        "meat",
+        "mayonnaise",
+        "fish",
+        "tuna",
+        "salmon",
+        "beef",
+        "lamb",
+        "veal",
+        "pork",
+        "kangaroo",
+        "chicken",
+        "turkey",
+        "duck",
+        "emu",
+        "goose",
+        "crab",
+        "lobster",
+        "mussel",
+        "oyster",
+        "clam",
+        "scallop",
+    ],
+    "vegetarian": [
+        "beef",
+        "lamb",
+        "veal",
+        "pork",
+        "kangaroo",
+        "chicken",
+        "turkey",
+        "duck",
+        "emu",
+        "goose",
+        "fish",
+        "tuna",
+        "crab",
+        "lobster",
+        "mussel",
+        "oyster",
+        "clam",
+        "scallop",
+    ],
+    "sugar free": [
+        "sugar",
+        "brown sugar",
+        "honey",
+        "maple syrup",
+        "syrup",
+        "ice cream",
+        "icing",
+        "candy",
+    ],
+    "dairy free": [
+        "milk",
+        "cheese",
+        "yogurt",
+        "butter",
+        "milkshake",
+        "cream",
+        "ice cream",
+        "custard",
+        "casein",
+        "lactose",
+        "frozen",
+    ],
+    "kosher": [
+        "pork",
+        "rabbit",
+        "squirrel",
+        "camel",
+        "kangaroo",
+        "horse",
+        "pork loin",
+        "bacon",
+        "pork chop",
+        "pork chops",
+        "pork belly",
+        "sausage",
+        "gelatin",
+        "eagle",
+        "owl",
+        "gull",
+        "hawk",
+        "flank",
+        "beef flank",
+        "short loin",
+        "sirloin",
+        "round",
+        "shank",
+    ],
+    "halal": [
+        "pork",
+        "bird",
+        "pork loin",
+        "bacon",
+        "pork chop",
+        "pork chops",
+        "pork belly",
+        "sausage",
+        "gelatin",
+    ],
+}
+
+NO_RESTRICTION = "none"
+
+_restriction_separator = re.compile(r"\s*(?:,|&|\band\b)\s*")
+
+
+def normalize_ingredient(ingredient):
+    return " ".join(ingredient.lower().split())
+
+
+BANNED = {
+    name: frozenset(normalize_ingredient(i) for i in ingredients)
+    for name, ingredients in RESTRICTIONS.items()
+}
+
+# one bit per restriction in RESTRICTIONS order. new restrictions must be added
+# at the end so the masks already stored with the recipes keep their meaning
+DIET_BITS = {name: 1 << bit for bit, name in enumerate(RESTRICTIONS)}
+
+# the keyword postings of a recipe are also written to a partition for each of
+# these restrictions it satisfies ("cookie#vegan"), most selective first. they
+# ban eggs, milk, butter or sugar, which most baking recipes use, so their
+# partitions are small. the other restrictions are satisfied by nearly every
+# recipe: a partition for them would copy almost every posting and save little
+# reading, so they are checked with a filter on the keyword's own partition
+PARTITIONED_DIETS = ("vegan", "dairy free", "sugar free")
+
+
+def parse_restrictions(value):
+    """
+    turn a slot value like "vegan and gluten free" into a tuple of restriction
+    names. "none" or an empty value gives an empty tuple
+    """
+    if not value:
+        return ()
+    names = []
+    for name in _restriction_separator.split(value.lower().strip()):
+        name = " ".join(name.split())
+        if name and name != NO_RESTRICTION and name not in names:
+            names.append(name)
+    return tuple(names)
+
+
+def unknown_restrictions(restrictions):
+    return [name for name in restrictions if name not in BANNED]
+
+
+@lru_cache(maxsize=64)
+def banned_ingredients(restrictions):
+    """
+    the union of the banned sets for a tuple of restriction names
+    """
+    banned = frozenset()
+    for name in restrictions:
+        banned |= BANNED.get(name, frozenset())
+    return banned
+
+
+def diet_mask(ner):
+    """
+    bitmask of the restrictions a recipe with this NER list satisfies
+    """
+    ingredients = {normalize_ingredient(i) for i in ner or []}
+    mask = 0
+    for name, banned in BANNED.items():
+        if banned.isdisjoint(ingredients):
+            mask |= DIET_BITS[name]
+    return mask
+
+
+def restriction_mask(restrictions):
+    """
+    the bits a recipe needs for every restriction, unknown names are ignored
+    """
+    mask = 0
+    for name in restrictions:
+        mask |= DIET_BITS.get(name, 0)
+    return mask
+
+
+def diet_names(mask):
+    return [name for name, bit in DIET_BITS.items() if mask & bit]
+
+
+def diet_keyword(keyword, name):
+    """
+    the partition of the postings for keyword that satisfy restriction name
+    """
+    return f"{keyword}#{name}"
+
+
+def partition_diet(names):
+    """
+    the restriction whose partition a search for names reads, None when none
+    of them has partitions
+    """
+    for name in PARTITIONED_DIETS:
+        if name in names:
+            return name
+    return None
@@ -7,17 +7,126 @@ as part of the 'OrderFlowers' template.
 For instructions on how to set up and test this bot, as well as additional samples,
 visit the Lex Getting Started documentation http://docs.aws.amazon.com/lex/latest/dg/getting-started.html.
 """
-import random
-import dateutil.parser
-import logging
-import boto3
-from boto3.dynamodb.conditions import Attr
+import time
 
-logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)
+_INIT_STARTED = time.perf_counter()
+
+import json
+import logging
+import os
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-dyn_client = boto3.client("dynamodb")
-TABLE_NAME = "bakingrecipes"
+import boto3
+from boto3.dynamodb.types import TypeDeserializer
+from botocore.config import Config
+
+import dietary_rules
+import recipe_ranking
+import recipe_render
+import request_metrics
+from recipe_keywords import clean_keyword, split_keywords
+from structured_log import log_event, log_payload, start_request
+
+_IMPORTS_DONE = time.perf_counter()
+
+TABLE_NAME = "bakingrecipes4"
+KEYWORD_TABLE_NAME = "bakingrecipes4_keywordsv2"
+
+# path to a local index built by lambda_update_dynamodb/buildIndex.py,
+# when unset the keyword table in DynamoDB is queried instead
+RECIPE_INDEX_PATH = os.environ.get("RECIPE_INDEX_PATH")
+_recipe_index = None
+
+# path to a spelling index built by lambda_update_dynamodb/buildVocabulary.py,
+# when unset search words are only cleaned and stemmed
+RECIPE_VOCABULARY_PATH = os.environ.get("RECIPE_VOCABULARY_PATH")
+_vocabulary = None
+
+# path to a corpus snapshot written by lambda_update_dynamodb/exportSnapshot.py,
+# full recipes found in it are not read from DynamoDB
+RECIPE_SNAPSHOT_PATH = os.environ.get("RECIPE_SNAPSHOT_PATH")
+_snapshot = None
+
+# instead of shipping them, the index, spelling index and snapshot can be
+# downloaded from S3 on first use (s3://bucket/key). the copies are kept in
+# RECIPE_CACHE_DIR, which lives as long as the container, and are downloaded
+# again only when the object changes. a failed download is retried after
+# DOWNLOAD_RETRY_SECONDS, until then searches use DynamoDB
+RECIPE_INDEX_URL = os.environ.get("RECIPE_INDEX_URL")
+RECIPE_VOCABULARY_URL = os.environ.get("RECIPE_VOCABULARY_URL")
+RECIPE_SNAPSHOT_URL = os.environ.get("RECIPE_SNAPSHOT_URL")
+RECIPE_CACHE_DIR = os.environ.get("RECIPE_CACHE_DIR", "/tmp/recipebot")
+DOWNLOAD_RETRY_SECONDS = 60
+_download_failures = {}
+_s3_client = None
+
+# full recipes read from DynamoDB are kept in a memory mapped store of at most
+# HOT_RECIPE_CACHE_MB in RECIPE_CACHE_DIR, so popular recipes are read once
+# per container. 0 turns it off. one process owns the store, any other process
+# using the same RECIPE_CACHE_DIR runs without it
+HOT_RECIPE_CACHE_MB = float(os.environ.get("HOT_RECIPE_CACHE_MB", "64"))
+_hot_recipes = None
+_hot_recipes_opened = False
+
+# per request budget for the DynamoDB keyword search
+QUERY_PAGE_SIZE = 100
+MAX_QUERY_PAGES = 10
+QUERY_TIME_BUDGET = 2.0
+ENOUGH_CANDIDATES = 50
+
+# the local index ranks the first LOCAL_CANDIDATES matches of a search, in
+# ordinal order. scoring every match of a common word (tens of thousands in
+# the full corpus) takes seconds, so like ENOUGH_CANDIDATES for DynamoDB this
+# is a budget: the best recipes of the matches read, not of every match
+LOCAL_CANDIDATES = 100
+
+# the keyword partitions of a search are queried concurrently, at most
+# QUERY_FAN_OUT pages in flight per container
+QUERY_FAN_OUT = int(os.environ.get("QUERY_FAN_OUT", "4"))
+
+# only the best RANK_TOP_K candidates are fetched and kept, one of them is
+# picked per request with softmax sampling at RANK_TEMPERATURE (0 = always best)
+RANK_TOP_K = int(os.environ.get("RANK_TOP_K", "10"))
+RANK_TEMPERATURE = float(os.environ.get("RANK_TEMPERATURE", "0.25"))
+
+# a recipe reply sends this many of its pre-rendered messages, the rest are
+# served by the ContinueRecipe intent
+RECIPE_MESSAGES_PER_PAGE = int(
+    os.environ.get("RECIPE_MESSAGES_PER_PAGE", str(recipe_render.MESSAGES_PER_PAGE))
+)
+
+# the candidates a search read but did not show are kept in the session for
+# follow-up requests, with the position it stopped at, so asking for more
+# serves every match once
+SEARCH_CURSOR_ATTRIBUTE = "search_cursor"
+
+# keyword search results cached per container
+QUERY_CACHE_SIZE = int(os.environ.get("QUERY_CACHE_SIZE", "128"))
+QUERY_CACHE_TTL = float(os.environ.get("QUERY_CACHE_TTL", "300"))
+
+# One low-level client per container, created during init and reused by every
+# invocation. The boto3 resource layer is skipped because loading its model
+# adds to every cold start. Keep-alive and a small pool keep the connection
+# to DynamoDB open between warm invocations.
+DYNAMODB_CONFIG = Config(
+    connect_timeout=1,
+    read_timeout=2,
+    retries={"max_attempts": 3, "mode": "standard"},
+    max_pool_connections=int(os.environ.get("DYNAMODB_POOL_SIZE", "10")),
+    tcp_keepalive=True,
+)
+dynamodb_client = boto3.client("dynamodb", config=DYNAMODB_CONFIG)
+_deserializer = TypeDeserializer()
+# low-level clients are thread safe, so the query threads share dynamodb_client
+# and its connection pool. the pool lives as long as the container
+_query_pool = ThreadPoolExecutor(
+    max_workers=max(1, QUERY_FAN_OUT), thread_name_prefix="query"
+)
+
+PREWARM_CONNECTIONS = os.environ.get("PREWARM_CONNECTIONS", "true").lower() != "false"
+_cold_start = True
 
 """ --- Helper functions for dynamodb"""
 
@@ -32,8 +141,168 @@ def safe_int(n):
     return n
 
 
-def get_random_recipe_index(list_length):
-    return random.randint(0, list_length - 1)
+class QueryCache:
+    """
+    LRU cache with a time to live, kept in module state so warm invocations of
+    the same container can answer repeated searches without DynamoDB
+    """
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] < self.ttl:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+        if entry is not None:
+            del self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = (time.monotonic(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries),
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+_query_cache = QueryCache(QUERY_CACHE_SIZE, QUERY_CACHE_TTL)
+
+
+def _is_count(value):
+    return type(value) is int and value >= 0
+
+
+def _is_strings(value):
+    return isinstance(value, list) and all(isinstance(v, str) for v in value)
+
+
+def valid_query(query):
+    """
+    whether query has the shape search_query returns
+    """
+    return (
+        isinstance(query, list)
+        and len(query) == 3
+        and isinstance(query[0], str)
+        and bool(query[0])
+        and _is_strings(query[1])
+        and _is_count(query[2])
+        and query[2] < 1 << len(dietary_rules.DIET_BITS)
+    )
+
+
+def valid_position(position):
+    """
+    whether position is one a search can continue from, see SearchCursor
+    """
+    if position is None or position == {}:
+        return True
+    if not isinstance(position, dict):
+        return False
+    if set(position) == {"o"}:
+        return _is_count(position["o"])
+    return (
+        set(position) == {"t", "k"}
+        and isinstance(position["t"], str)
+        and isinstance(position["k"], str)
+    )
+
+
+class SearchCursor:
+    """
+    what a reply remembers about its search in the session attributes, so
+    asking again serves the next result without searching from scratch:
+        query       the resolved [item, descriptors, restriction mask]
+        ids         recipe Ids the search read but did not show yet, best first
+        position    where reading continues: {} before the first search,
+                    {"o": ordinal} after the last ordinal read from the local
+                    index, {"t": term, "k": posting Id} after the last posting
+                    read from the keyword partition of term, None once every
+                    match was read
+        ahead       Ids that were shown or are in ids but come later in the
+                    partition being read, they are skipped when it gets there
+        shown       how many recipes were shown
+    """
+
+    def __init__(self, query, ids=(), position=(), ahead=(), shown=0):
+        self.query = query
+        self.ids = list(ids)
+        self.position = None if position is None else dict(position)
+        self.ahead = list(ahead)
+        self.shown = shown
+
+    def dumps(self):
+        state = {
+            "q": self.query,
+            "i": self.ids,
+            "p": self.position,
+            "a": self.ahead,
+            "n": self.shown,
+        }
+        return json.dumps(state, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, text):
+        """
+        the cursor saved by dumps, or None if there is none or it is not in
+        the shape dumps writes. session attributes come from the client, so a
+        cursor that is not is dropped and the request searches from scratch
+        """
+        if not text:
+            return None
+        try:
+            state = json.loads(text)
+            query, ids, position, ahead, shown = (state[key] for key in "qipan")
+        except (ValueError, KeyError, TypeError):
+            return None
+        if not (
+            valid_query(query)
+            and _is_strings(ids)
+            and valid_position(position)
+            and _is_strings(ahead)
+            and _is_count(shown)
+        ):
+            return None
+        return cls(query, ids, position, ahead, shown)
+
+
+def search_query(item, descriptors, restrictions):
+    mask = dietary_rules.restriction_mask(restrictions)
+    return [item, sorted(set(descriptors)), mask]
+
+
+def from_dynamodb(item):
+    """
+    convert a low-level client item into plain python values
+    """
+    return {key: _deserializer.deserialize(value) for key, value in item.items()}
+
+
+def query_cache_key(item, descriptors, restrictions=()):
+    return (
+        item,
+        tuple(sorted(set(descriptors))),
+        dietary_rules.restriction_mask(restrictions),
+    )
 
 
 def try_ex(func):
@@ -63,63 +332,646 @@ def confirm_intent(session_attributes, intent_name, slots, message):
 """ --- Dynamodb query"""
 
 
-def retrive_recipe(item, filter_strings=None):
-    query_limit = 100
-    dynamodb = boto3.resource("dynamodb")
-    table = dynamodb.Table("bakingrecipes4_keywordsv2")
-
-    key_condition_expression = "keywords = :keyword"
-    expression_attribute_values = {":keyword": str(item)}
+def local_file(path, url, module):
+    """
+    the path of a recipe file written by module: the shipped file at path, or
+    the copy of url in RECIPE_CACHE_DIR. None when neither is usable
+    """
+    global _s3_client
+    if path:
+        return path
+    if not url or time.time() < _download_failures.get(url, 0):
+        return None
+    import recipe_cache
 
-    response = table.query(
-        IndexName="keywords-index",
-        KeyConditionExpression=key_condition_expression,
-        ExpressionAttributeValues=expression_attribute_values,
-        Limit=query_limit,
+    if _s3_client is None:
+        _s3_client = boto3.client("s3")
+    started = time.perf_counter()
+    try:
+        path, status = recipe_cache.cached_file(
+            _s3_client, url, RECIPE_CACHE_DIR, module.MAGIC, module.VERSION
+        )
+    except Exception as error:
+        _download_failures[url] = time.time() + DOWNLOAD_RETRY_SECONDS
+        log_event("cache_file_failed", logging.WARNING, url=url, error=str(error))
+        return None
+    _download_failures.pop(url, None)
+    log_event(
+        "cache_file",
+        url=url,
+        path=path,
+        status=status,
+        ms=round((time.perf_counter() - started) * 1000, 2),
     )
+    return path
+
+
+def get_snapshot():
+    """
+    open the corpus snapshot once per container, warm invocations reuse it.
+    None without a snapshot
+    """
+    global _snapshot
+    if _snapshot is None and (RECIPE_SNAPSHOT_PATH or RECIPE_SNAPSHOT_URL):
+        import recipe_snapshot
+
+        path = local_file(RECIPE_SNAPSHOT_PATH, RECIPE_SNAPSHOT_URL, recipe_snapshot)
+        if path:
+            _snapshot = recipe_snapshot.RecipeSnapshot(path)
+    return _snapshot
+
+
+def get_hot_recipes():
+    """
+    open the hot recipe store once per container. a store left in
+    RECIPE_CACHE_DIR by an earlier init is reused. None when it is turned off,
+    cannot be opened or belongs to another process
+    """
+    global _hot_recipes, _hot_recipes_opened
+    if not _hot_recipes_opened and HOT_RECIPE_CACHE_MB > 0:
+        import recipe_cache
+
+        _hot_recipes_opened = True
+        try:
+            _hot_recipes = recipe_cache.HotRecipeStore(
+                os.path.join(RECIPE_CACHE_DIR, "hot_recipes.bin"),
+                int(HOT_RECIPE_CACHE_MB * 2**20),
+            )
+        except OSError as error:
+            log_event("hot_recipes_failed", logging.WARNING, error=str(error))
+    return _hot_recipes
 
-    print("Query parameters: ")
-    print("IndexName: ", "keywords-index")
-    print("KeyConditionExpression: ", key_condition_expression)
-    print("ExpressionAttributeValues: ", expression_attribute_values)
-
-    print("this is response")
-    print(response["Items"])
-
-    if filter_strings:
-        filter_strings = [s.lower() for s in filter_strings]
-        print("this is filter_strings length: " + str(len(filter_strings)))
-        print(filter_strings)
-
-        filtered_items = []
-        last_evaluated_key = None
-        while not filtered_items:
-            query_params = {
-                "IndexName": "keywords-index",
-                "KeyConditionExpression": key_condition_expression,
-                "ExpressionAttributeValues": expression_attribute_values,
-                "Limit": query_limit,
-            }
 
-            if last_evaluated_key:
-                query_params["ExclusiveStartKey"] = last_evaluated_key
+def hot_recipes(recipe_ids):
+    """
+    the recipes of recipe_ids that are in the hot recipe store, by Id. an
+    entry that does not decode is dropped and the recipe read from DynamoDB
+    """
+    store = get_hot_recipes()
+    recipes = {}
+    if store is None:
+        return recipes
+    for recipe_id in recipe_ids:
+        item = store.get(recipe_id)
+        if item is None:
+            continue
+        try:
+            recipes[recipe_id] = from_dynamodb(json.loads(item))
+        except (ValueError, TypeError, AttributeError) as error:
+            store.discard(recipe_id)
+            request_metrics.count("hot_recipe_errors")
+            log_event(
+                "hot_recipe_unreadable",
+                logging.WARNING,
+                recipe_id=recipe_id,
+                error=str(error),
+            )
+    request_metrics.count("hot_recipe_hits", len(recipes))
+    return recipes
 
-            response = table.query(**query_params)
-            filtered_items = [
-                item
-                for item in response["Items"]
-                if all(s in item["title"].lower() for s in filter_strings)
-            ]
 
-            if "LastEvaluatedKey" in response:
-                last_evaluated_key = response["LastEvaluatedKey"]
-            else:
+def keep_hot(item):
+    """
+    add a full recipe item, as DynamoDB returned it, to the hot recipe store
+    """
+    store = get_hot_recipes()
+    if store is None:
+        return
+    try:
+        store.put(item["Id"]["S"], json.dumps(item).encode("utf-8"))
+    except OSError as error:
+        log_event("hot_recipes_failed", logging.WARNING, error=str(error))
+
+
+def snapshot_recipes(recipe_ids):
+    """
+    the recipes of recipe_ids that are in the snapshot, by Id
+    """
+    snapshot = get_snapshot()
+    recipes = {}
+    for recipe_id in recipe_ids:
+        ordinal = snapshot.find(recipe_id)
+        if ordinal is not None:
+            recipes[recipe_id] = snapshot.recipe(ordinal)
+    request_metrics.count("snapshot_reads", len(recipes))
+    return recipes
+
+
+def fetch_recipes(postings):
+    """
+    fetch the full recipes for matched keyword postings, from the snapshot when
+    there is one, then from the hot recipe store and with BatchGetItem for the
+    rest. the keyword table only stores recipe_id and title, so each recipe is
+    read once
+    """
+    recipe_ids = list(dict.fromkeys(posting["recipe_id"] for posting in postings))
+    recipes = {}
+    if get_snapshot() is not None:
+        with request_metrics.stage("snapshot_read"):
+            recipes = snapshot_recipes(recipe_ids)
+    missing = [i for i in recipe_ids if i not in recipes]
+    if missing and get_hot_recipes() is not None:
+        recipes.update(hot_recipes(missing))
+        missing = [i for i in missing if i not in recipes]
+    for start in range(0, len(missing), 100):
+        keys = [{"Id": {"S": i}} for i in missing[start : start + 100]]
+        pending = {TABLE_NAME: {"Keys": keys}}
+        attempt = 0
+        while pending:
+            with request_metrics.stage("batch_get"):
+                response = dynamodb_client.batch_get_item(RequestItems=pending)
+            request_metrics.count("batch_get_calls")
+            for item in response["Responses"].get(TABLE_NAME, []):
+                keep_hot(item)
+                recipe = from_dynamodb(item)
+                recipes[recipe["Id"]] = recipe
+            pending = response.get("UnprocessedKeys")
+            if pending:
+                attempt += 1
+                time.sleep(min(1, 0.05 * 2**attempt))
+
+    request_metrics.count("recipes_fetched", len(recipes))
+    if _hot_recipes is not None:
+        log_event("hot_recipes", **_hot_recipes.stats())
+    # keep the order the postings came back in
+    return [recipes[i] for i in recipe_ids if i in recipes]
+
+
+def title_matches(title, terms):
+    keywords = split_keywords(title)
+    return all(term in keywords for term in terms)
+
+
+def get_vocabulary():
+    """
+    open the spelling index once per container, warm invocations reuse it.
+    None without a spelling index
+    """
+    global _vocabulary
+    if _vocabulary is None and (RECIPE_VOCABULARY_PATH or RECIPE_VOCABULARY_URL):
+        import recipe_vocabulary
+
+        path = local_file(
+            RECIPE_VOCABULARY_PATH, RECIPE_VOCABULARY_URL, recipe_vocabulary
+        )
+        if path:
+            _vocabulary = recipe_vocabulary.Vocabulary(path)
+    return _vocabulary
+
+
+def resolve_terms(item, filter_strings):
+    """
+    map the item word and the descriptor words to index keys before any query.
+    words are cleaned and stemmed like the indexed titles, and with a spelling
+    index misspelled words are corrected. descriptors that nothing is close to
+    are dropped, so a typo in an adjective does not hide every recipe
+    """
+    item_term = clean_keyword(str(item))
+    words = [word for s in filter_strings or [] for word in split_keywords(s)]
+    vocabulary = get_vocabulary()
+    if vocabulary is not None:
+        resolved_item = vocabulary.correct(item_term) if item_term else None
+        resolved_words = [word for word in map(vocabulary.correct, words) if word]
+        if resolved_item != item_term or resolved_words != words:
+            log_event(
+                "resolve_terms",
+                item=item_term,
+                descriptors=words,
+                resolved_item=resolved_item,
+                resolved_descriptors=resolved_words,
+            )
+        item_term = resolved_item or item_term
+        words = resolved_words
+    descriptors = [word for word in dict.fromkeys(words) if word != item_term]
+    return item_term, descriptors
+
+
+def search_terms(item, descriptors):
+    """
+    the keyword terms of a search, descriptors first and the item last
+    """
+    return [term for term in dict.fromkeys(list(descriptors) + [item]) if term]
+
+
+def make_scorer(terms):
+    """
+    BM25 idf weights come from the local index when there is one, without it
+    every term weighs the same
+    """
+    index = get_recipe_index()
+    if index is None:
+        return recipe_ranking.Scorer(terms)
+    idf = {
+        term: recipe_ranking.bm25_idf(index.document_frequency(term), len(index))
+        for term in terms
+    }
+    return recipe_ranking.Scorer(terms, idf, index.average_terms())
+
+
+def diet_filter(restrictions):
+    """
+    the diet partition a search with restrictions reads, None for the
+    keyword's own partition, and a FilterExpression and its values for the
+    other restrictions. the partition only holds postings compatible with its
+    restriction, so the query never reads (or pays for) recipes that fail it;
+    the filter drops postings that fail one of the others, which nearly every
+    recipe satisfies
+    """
+    names = dietary_rules.diet_names(dietary_rules.restriction_mask(restrictions))
+    diet = dietary_rules.partition_diet(names)
+    others = [name for name in names if name != diet]
+    expression = " AND ".join(f"contains(diets, :diet{i})" for i in range(len(others)))
+    values = {f":diet{i}": {"S": name} for i, name in enumerate(others)}
+    return diet, expression, values
+
+
+def query_page(query_params):
+    """
+    one keyword query, run on a query thread. returns the response and how long
+    it took, metrics are recorded by the request thread
+    """
+    started = time.perf_counter()
+    response = dynamodb_client.query(**query_params)
+    return response, (time.perf_counter() - started) * 1000
+
+
+def dynamodb_postings(item, descriptors, restrictions, scorer, position, exclude=()):
+    """
+    find postings whose title has the keyword item and every descriptor keyword,
+    for recipes that satisfy every dietary restriction, and score them.
+    returns (scored, passed, position): the (score, posting) pairs of the
+    candidates read, the recipe Ids of every posting read in the partition the
+    search continues in, and where it continues, None once every match was
+    read.
+
+    every term has to be in the title, so the keyword partition of any one term
+    holds all the answers and a posting from any partition can be checked
+    against every term on its own. a new search queries the partitions of all
+    indexed terms at the same time on the query pool, one page in flight per
+    term, and merges pages as they arrive, so a multi word search takes about as
+    long as its slowest first page instead of one round trip per term. the
+    search stops once it has enough candidates, a partition runs out, or the
+    page/time budget for the request is spent; pages still in flight are then
+    cancelled or left to finish unread.
+
+    a match is in every partition, so only one of them can be read on without
+    coming across matches again: the one the search read furthest. position
+    holds its term and the Id of the last posting read from it, and a search
+    for more reads that partition only, from there on. recipes in exclude are
+    skipped
+    """
+    terms = search_terms(item, descriptors)
+    diet, diet_expression, diet_values = diet_filter(restrictions)
+
+    def submit(term):
+        keyword = term if diet is None else dietary_rules.diet_keyword(term, diet)
+        query_params = {
+            "TableName": KEYWORD_TABLE_NAME,
+            "IndexName": "keywords-index",
+            "KeyConditionExpression": "keywords = :keyword",
+            "ExpressionAttributeValues": {":keyword": {"S": keyword}, **diet_values},
+            "Limit": QUERY_PAGE_SIZE,
+        }
+        if diet_expression:
+            query_params["FilterExpression"] = diet_expression
+        if last.get(term):
+            # the key of a keywords-index page is the posting Id and keyword
+            query_params["ExclusiveStartKey"] = {
+                "Id": {"S": last[term]},
+                "keywords": {"S": keyword},
+            }
+        running[_query_pool.submit(query_page, query_params)] = term
+
+    scored = []
+    found = set()
+    # per term, the recipe Ids read from its partition and the last posting Id
+    read = {}
+    last = {}
+    if position:
+        unread = [position["t"]]
+        last[position["t"]] = position["k"]
+    else:
+        unread = list(reversed(terms))
+    running = {}
+    requested = 0
+    pages = 0
+    scanned = 0
+    complete = None
+    started = time.perf_counter()
+    try:
+        while complete is None and len(found) < ENOUGH_CANDIDATES:
+            # the next pages are queued once everything that arrived is merged
+            while unread and requested < MAX_QUERY_PAGES:
+                submit(unread.pop())
+                requested += 1
+            remaining = QUERY_TIME_BUDGET - (time.perf_counter() - started)
+            if not running or remaining <= 0:
                 break
+            finished, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in finished:
+                term = running.pop(future)
+                response, elapsed_ms = future.result()
+                # Limit counts the postings read before the filter for the
+                # restrictions other than the partition's
+                page_scanned = response.get("ScannedCount", len(response["Items"]))
+                pages += 1
+                scanned += page_scanned
+                request_metrics.record("query_page", elapsed_ms)
+                request_metrics.count("pages_read")
+                request_metrics.count("items_scanned", page_scanned)
+                postings = read.setdefault(term, set())
+                for posting in map(from_dynamodb, response["Items"]):
+                    if complete is not None or len(found) >= ENOUGH_CANDIDATES:
+                        # the rest of the page is read again by the next search
+                        break
+                    recipe_id = posting["recipe_id"]
+                    postings.add(recipe_id)
+                    last[term] = posting["Id"]
+                    if recipe_id in found or recipe_id in exclude:
+                        continue
+                    if title_matches(posting["title"], terms):
+                        found.add(recipe_id)
+                        scored.append((scorer.score(posting), posting))
+                else:
+                    if "LastEvaluatedKey" in response:
+                        last[term] = from_dynamodb(response["LastEvaluatedKey"])["Id"]
+                        unread.append(term)
+                    elif complete is None:
+                        # this partition had every possible match
+                        complete = term
+    finally:
+        abandoned = len(running)
+        for future in running:
+            future.cancel()
+
+    if complete is not None:
+        passed, position = read[complete], None
+    elif read:
+        term = max(read, key=lambda t: len(read[t]))
+        passed, position = read[term], {"t": term, "k": last[term]}
+    else:
+        passed = set()
+
+    request_metrics.count("queries_abandoned", abandoned)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    log_event(
+        "keyword_search",
+        terms=terms,
+        restrictions=list(restrictions),
+        pages=pages,
+        scanned=scanned,
+        matched=len(found),
+        abandoned=abandoned,
+        position=position,
+        elapsed_ms=round(elapsed_ms, 1),
+    )
+    return scored, passed, position
+
+
+def get_recipe_index():
+    """
+    open the local index once per container, warm invocations reuse it.
+    None without a local index
+    """
+    global _recipe_index
+    if _recipe_index is None and (RECIPE_INDEX_PATH or RECIPE_INDEX_URL):
+        import recipe_index
+
+        path = local_file(RECIPE_INDEX_PATH, RECIPE_INDEX_URL, recipe_index)
+        if path:
+            _recipe_index = recipe_index.RecipeIndex(path)
+    return _recipe_index
 
-        print("Filtered results: ", filtered_items)
-        return filtered_items
 
-    return response["Items"]
+def local_postings(item, descriptors, restrictions, scorer, position, exclude=()):
+    """
+    find postings for item in the local index without any network I/O.
+    the item and descriptor keywords are all index terms, so the matches are
+    the intersection of their postings, in ordinal order. the first
+    LOCAL_CANDIDATES matches after position outside exclude are scored.
+    returns (scored, passed, position) like dynamodb_postings, position holds
+    the last ordinal read
+    """
+    index = get_recipe_index()
+    required = dietary_rules.restriction_mask(restrictions)
+    ordinals = index.search(search_terms(item, descriptors))
+
+    scored = []
+    passed = set()
+    after = position["o"] if position else -1
+    for ordinal in ordinals[bisect_right(ordinals, after) :]:
+        if index.diet_mask(ordinal) & required != required:
+            continue
+        recipe_id = index.recipe_id(ordinal)
+        passed.add(recipe_id)
+        if recipe_id in exclude:
+            continue
+        posting = dict(
+            index.features(ordinal), recipe_id=recipe_id, title=index.title(ordinal)
+        )
+        scored.append((scorer.score(posting), posting))
+        if len(scored) == LOCAL_CANDIDATES:
+            return scored, passed, {"o": ordinal}
+    return scored, passed, None
+
+
+def search_postings(item, descriptors, restrictions, scorer, cursor):
+    """
+    read the next candidates of a search from where cursor stopped, from the
+    local index when there is one and from the DynamoDB keyword table without
+    it or when the index has no match (it can be older than the table). a
+    search continues in the backend it started in
+    """
+    position = cursor.position
+    exclude = set(cursor.ids) | set(cursor.ahead)
+    if get_recipe_index() is not None and (not position or "o" in position):
+        result = local_postings(
+            item, descriptors, restrictions, scorer, position, exclude
+        )
+        if result[0] or position:
+            return result
+        request_metrics.count("index_misses")
+    elif position and "o" in position:
+        # a search started in the local index of another container
+        log_event("search_cursor_unusable", logging.WARNING, position=position)
+        return [], set(), None
+    return dynamodb_postings(item, descriptors, restrictions, scorer, position, exclude)
+
+
+def ranked_recipes(item, descriptors, restrictions, cursor):
+    """
+    read the next candidates of a search and rank them. returns
+    (ranked, pending, passed, position):
+        ranked      (score, recipe) pairs for the top RANK_TOP_K candidates,
+                    best first. only those are fetched
+        pending     Ids of the other candidates the search read past, best
+                    first, they are not read again
+        passed      Ids the search read past
+        position    where the search for more continues, None when every
+                    match was read
+
+    a new search is cached per container
+    """
+    cache_key = query_cache_key(item, descriptors, restrictions)
+    new = cursor.position == {}
+    result = _query_cache.get(cache_key) if new else None
+    request_metrics.count("cache_hits" if result is not None else "cache_misses")
+    if result is None:
+        scorer = make_scorer(search_terms(item, descriptors))
+        scored, passed, position = search_postings(
+            item, descriptors, restrictions, scorer, cursor
+        )
+        top = recipe_ranking.TopK(RANK_TOP_K)
+        for score, posting in scored:
+            top.push(score, posting)
+        postings = top.ranked()
+        shortlisted = {posting["recipe_id"] for _, posting in postings}
+        pending = [
+            posting["recipe_id"]
+            for _, posting in sorted(scored, key=lambda entry: -entry[0])
+            if posting["recipe_id"] in passed
+            and posting["recipe_id"] not in shortlisted
+        ]
+        recipes = {
+            recipe["Id"]: recipe
+            for recipe in fetch_recipes([posting for _, posting in postings])
+        }
+        ranked = [
+            (score, recipes[posting["recipe_id"]])
+            for score, posting in postings
+            if posting["recipe_id"] in recipes
+        ]
+        request_metrics.count("candidates_ranked", top.seen)
+        result = ranked, pending, passed, position
+        if new:
+            _query_cache.put(cache_key, result)
+
+    log_event("query_cache", **_query_cache.stats())
+    return result
+
+
+def shortlisted_recipe(cursor):
+    """
+    the next recipe of the cursor's shortlist that still exists, one GetItem
+    per recipe. None once the shortlist is used up
+    """
+    while cursor.ids:
+        recipe = get_recipe(cursor.ids.pop(0))
+        if recipe is not None:
+            cursor.shown += 1
+            return recipe
+    return None
+
+
+def next_recipe(item, descriptors, restrictions, cursor):
+    """
+    the next recipe for a search and the cursor to keep for the one after.
+    a cursor from an earlier reply to the same search serves its shortlist
+    first and then reads on from where the search stopped. returns
+    (None, cursor) when nothing was found, the cursor's position tells whether
+    every match has been shown
+    """
+    query = search_query(item, descriptors, restrictions)
+    if cursor is None or cursor.query != query:
+        cursor = SearchCursor(query)
+    elif cursor.ids:
+        request_metrics.count("cursor_hits")
+        recipe = shortlisted_recipe(cursor)
+        if recipe is not None:
+            return recipe, cursor
+    if cursor.position is None:
+        return None, cursor
+
+    ranked, pending, passed, position = ranked_recipes(
+        item, descriptors, restrictions, cursor
+    )
+    request_metrics.count("items_returned", len(ranked))
+    log_event(
+        "recipe_results",
+        matched=len(ranked),
+        recipe_ids=[recipe["Id"] for _, recipe in ranked],
+        scores=[round(score, 3) for score, _ in ranked],
+    )
+    log_payload("recipe_results_payload", lambda: [recipe for _, recipe in ranked])
+    # the shortlist comes up again further on in the partition being read
+    cursor.ahead = [i for i in cursor.ahead if i not in passed] + [
+        recipe["Id"] for _, recipe in ranked if recipe["Id"] not in passed
+    ]
+    cursor.position = position
+    cursor.ids = list(pending)
+    if not ranked:
+        return shortlisted_recipe(cursor), cursor
+    _, recipe = recipe_ranking.sample(ranked, RANK_TEMPERATURE)
+    cursor.ids = [r["Id"] for _, r in ranked if r["Id"] != recipe["Id"]] + pending
+    cursor.shown += 1
+    return recipe, cursor
+
+
+def retrive_recipe(item, filter_strings=None, restrictions=(), cursor=None):
+    """
+    the recipe to show for the keyword item, the keywords of the filter strings
+    and the dietary restrictions, or None, and the cursor for the next one
+    """
+    item, descriptors = resolve_terms(item, filter_strings)
+    return next_recipe(item, descriptors, restrictions, cursor)
+
+
+def get_recipe(recipe_id):
+    """
+    one full recipe by Id, from the snapshot, the hot recipe store or with a
+    GetItem. None if the recipe is gone
+    """
+    if get_snapshot() is not None:
+        recipe = snapshot_recipes([recipe_id]).get(recipe_id)
+        if recipe is not None:
+            return recipe
+    recipe = hot_recipes([recipe_id]).get(recipe_id)
+    if recipe is not None:
+        return recipe
+    response = dynamodb_client.get_item(
+        TableName=TABLE_NAME, Key={"Id": {"S": recipe_id}}
+    )
+    request_metrics.count("get_item_calls")
+    if "Item" not in response:
+        return None
+    keep_hot(response["Item"])
+    return from_dynamodb(response["Item"])
+
+
+def recipe_messages(recipe):
+    """
+    the messages rendered at ingest, recipes imported before that are
+    rendered here
+    """
+    return recipe.get("rendered") or recipe_render.render_messages(recipe)
+
+
+def stored_messages(recipe_id):
+    """
+    the messages of one recipe, from the snapshot, the hot recipe store or
+    with a GetItem that only reads the rendered messages. None if the recipe
+    is gone
+    """
+    if get_snapshot() is not None:
+        recipe = snapshot_recipes([recipe_id]).get(recipe_id)
+        if recipe is not None:
+            return recipe_messages(recipe)
+    recipe = hot_recipes([recipe_id]).get(recipe_id)
+    if recipe is not None:
+        return recipe_messages(recipe)
+    response = dynamodb_client.get_item(
+        TableName=TABLE_NAME,
+        Key={"Id": {"S": recipe_id}},
+        ProjectionExpression="rendered",
+    )
+    request_metrics.count("get_item_calls")
+    if "Item" not in response:
+        return None
+    rendered = from_dynamodb(response["Item"]).get("rendered")
+    if rendered:
+        return rendered
+    recipes = fetch_recipes([{"recipe_id": recipe_id}])
+    return recipe_messages(recipes[0]) if recipes else None
 
 
 """ --- Helpers to build responses which match the structure of the necessary dialog actions --- """
@@ -143,6 +995,10 @@ def elicit_slot(session_attributes, intent_name, slots, slot_to_elicit, message)
 
 
 def close(session_attributes, intent_name, fulfillment_state, message):
+    return close_messages(session_attributes, intent_name, fulfillment_state, [message])
+
+
+def close_messages(session_attributes, intent_name, fulfillment_state, messages):
     response = {
         "sessionState": {
             "sessionAttributes": session_attributes,
@@ -152,12 +1008,16 @@ def close(session_attributes, intent_name, fulfillment_state, message):
             },
             "intent": {"name": intent_name, "state": fulfillment_state},
         },
-        "messages": [message],
+        "messages": messages,
     }
 
     return response
 
 
+def plain_text(content):
+    return {"contentType": "PlainText", "content": content}
+
+
 def delegate(session_attributes, slots):
     return {
         "sessionAttributes": session_attributes,
@@ -165,6 +1025,24 @@ def delegate(session_attributes, slots):
     }
 
 
+def recipe_reply(session_attributes, intent_name, recipe_id, messages, number):
+    """
+    close with page number of a recipe's messages. when pages are left, the
+    session remembers the recipe and the next page for ContinueRecipe
+    """
+    contents, more = recipe_render.page(messages, number, RECIPE_MESSAGES_PER_PAGE)
+    session_attributes = dict(session_attributes or {})
+    if more:
+        session_attributes.update(recipe_id=recipe_id, recipe_page=str(number + 1))
+    else:
+        session_attributes.pop("recipe_id", None)
+        session_attributes.pop("recipe_page", None)
+    request_metrics.count("messages_sent", len(contents))
+    return close_messages(
+        session_attributes, intent_name, "Fulfilled", list(map(plain_text, contents))
+    )
+
+
 """ --- Helper Functions --- """
 
 
@@ -190,21 +1068,12 @@ def build_validation_result(is_valid, violated_slot, message_content):
 
 
 def validate_ask_for_recipe(item, flavor, dietary_restrictions):
-    allowed_dietary_restrictions = [
-        "gluten free",
-        "nuts free",
-        "vegan",
-        "vegetarian",
-        "sugar free",
-        "dairy free",
-        "kosher",
-        "halal",
-        "none",
-    ]
-    if (
-        dietary_restrictions is not None
-        and dietary_restrictions not in allowed_dietary_restrictions
-    ):
+    restrictions = ()
+    if dietary_restrictions is not None:
+        restrictions = dietary_rules.parse_restrictions(
+            try_ex(lambda: dietary_restrictions["value"]["interpretedValue"])
+        )
+    if dietary_rules.unknown_restrictions(restrictions):
         return build_validation_result(
             False,
             "dietary_restrictions",
@@ -214,178 +1083,6 @@ def validate_ask_for_recipe(item, flavor, dietary_restrictions):
     return build_validation_result(True, None, None)
 
 
-def valid_item(dietaryRestriction, NER):
-    if dietaryRestriction == "none":
-        return True
-    glutenfree = [
-        "bread",
-        "pasta",
-        "cereal",
-        "crackers",
-        "beer",
-        "gravy",
-        "ale",
-        "wheat",
-        "cookies",
-    ]
-    nutsfree = [
-        "almonds",
-        "walnuts",
-        "pecans",
-        "cashews",
-        "hazelnuts",
-        "peanuts",
-        "macadamia nuts",
-        "pine nuts",
-        "Brazil nuts",
-        "pistachios",
-        "butternuts",
-    ]
-    vegan = [
-        "eggs",
-        "egg",
-        "cheese",
-        "milk",
-        "ice cream",
-        "honey",
-        "meat",
-        "mayonnaise",
-        "fish",
-        "tuna",
-        "salmon",
-        "beef",
-        "lamb",
-        "veal",
-        "pork",
-        "kangaroo",
-        "chicken",
-        "turkey",
-        "duck",
-        "emu",
-        "goose",
-        "fish",
-        "tuna",
-        "crab",
-        "lobster",
-        "mussel",
-        "oyster",
-        "clam",
-        "scallop",
-    ]
-    vegetarian = [
-        "beef",
-        "lamb",
-        "veal",
-        "pork",
-        "kangaroo",
-        "chicken",
-        "turkey",
-        "duck",
-        "emu",
-        "goose",
-        "fish",
-        "tuna",
-        "crab",
-        "lobster",
-        "mussel",
-        "oyster",
-        "clam",
-        "scallop",
-    ]
-    sugarfree = [
-        "sugar",
-        "brown sugar" "honey",
-        "maple syurp",
-        "syrup",
-        "ice cream",
-        "icing",
-        "candy",
-    ]
-    dairyfree = [
-        "milk",
-        "cheese",
-        "yogurt",
-        "butter",
-        "milkshake",
-        "cream",
-        "ice cream",
-        "custard",
-        "Casein",
-        "lactose",
-        "frozen",
-    ]
-    kosher = [
-        "pork",
-        "rabbit",
-        "squirrel",
-        "camel",
-        "kangaroo",
-        "horse",
-        "pork loin",
-        "bacon",
-        "pork chop",
-        "pork chops",
-        "pork belly",
-        "sausage",
-        "gelatin",
-        "eagle",
-        "owl",
-        "gull",
-        "hawk",
-        "flank",
-        "beef flank",
-        "short loin",
-        "sirloin",
-        "round",
-        "shank",
-    ]
-    halal = [
-        "pork",
-        "bird",
-        "pork loin",
-        "bacon",
-        "pork chop",
-        "pork chops",
-        "pork belly",
-        "sausage",
-        "gelatin",
-    ]
-
-    if dietaryRestriction == "gluten free":
-        for item in glutenfree:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "nuts free":
-        for item in nutsfree:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "vegan":
-        for item in vegan:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "vegetarian":
-        for item in vegetarian:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "sugar free":
-        for item in sugarfree:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "dairy free":
-        for item in dairyfree:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "kosher":
-        for item in kosher:
-            if item in NER:
-                return False
-    elif dietaryRestriction == "halal":
-        for item in halal:
-            if item in NER:
-                return False
-    return True
-
-
 """ --- Functions that control the bot's behavior --- """
 
 
@@ -438,66 +1135,142 @@ def ask_for_recipe(intent_request):
 
     # Order the flowers, and rely on the goodbye message of the bot to define the message to the end user.
     # In a real bot, this would likely involve a call to a backend service.
-    print("Item: ", item["value"]["interpretedValue"])
-    print("Flavor: ", flavor["value"]["interpretedValue"])
+    with request_metrics.stage("slot_parsing"):
+        item_last = item["value"]["interpretedValue"].split(" ")[-1]
+        flavor_plus_descriptors = item["value"]["interpretedValue"].split(" ")
+        flavor_plus_descriptors.pop()
+
+        if (
+            flavor["value"]["interpretedValue"] != "any"
+            and flavor["value"]["interpretedValue"] != "none"
+            and flavor["value"]["interpretedValue"] != "no"
+        ):
+            flavor_plus_descriptors.extend(
+                flavor["value"]["interpretedValue"].split(" ")
+            )
+        restrictions = dietary_rules.parse_restrictions(
+            dietary_restrictions["value"]["interpretedValue"]
+        )
 
-    item_last = item["value"]["interpretedValue"].split(" ")[-1]
-    flavor_plus_descriptors = item["value"]["interpretedValue"].split(" ")
-    flavor_plus_descriptors.pop()
+    log_event(
+        "ask_for_recipe",
+        item=item["value"]["interpretedValue"],
+        flavor=flavor["value"]["interpretedValue"],
+        dietary_restrictions=dietary_restrictions["value"]["interpretedValue"],
+        keyword=item_last,
+        descriptors=flavor_plus_descriptors,
+    )
 
-    print("flavor_plus_descriptors after splitting item:", flavor_plus_descriptors)
+    session_attributes = intent_request["sessionState"].get("sessionAttributes")
+    cursor = SearchCursor.loads((session_attributes or {}).get(SEARCH_CURSOR_ATTRIBUTE))
 
-    if (
-        flavor["value"]["interpretedValue"] != "any"
-        and flavor["value"]["interpretedValue"] != "none"
-        and flavor["value"]["interpretedValue"] != "no"
-    ):
-        flavor_plus_descriptors.extend(flavor["value"]["interpretedValue"].split(" "))
+    # the keyword postings are tagged with the dietary restrictions each recipe
+    # satisfies, so the search only returns recipes the user can eat. asking
+    # the same again serves the next recipe of the search from the cursor
+    with request_metrics.stage("search"):
+        recipe, cursor = retrive_recipe(
+            item_last, flavor_plus_descriptors, restrictions, cursor
+        )
 
-    print("Item last: ", item_last)
-    print("flavor_plus_descriptors after adding flavor:", flavor_plus_descriptors)
+    return search_reply(
+        session_attributes,
+        intent_request["sessionState"]["intent"]["name"],
+        recipe,
+        cursor,
+        "Sorry, we don't have any {}recipes for {} with a flavor of {}.".format(
+            "more " if cursor.shown else "",
+            item["value"]["interpretedValue"],
+            flavor["value"]["interpretedValue"],
+        ),
+    )
 
-    results = retrive_recipe(item_last, flavor_plus_descriptors)
 
-    filtered_dietary_results = [
-        result
-        for result in results
-        if valid_item(dietary_restrictions["value"]["interpretedValue"], result["NER"])
-    ]
+def another_recipe(intent_request):
+    """
+    the next recipe for the search this session asked for last
+    """
+    session_attributes = intent_request["sessionState"].get("sessionAttributes")
+    intent_name = intent_request["sessionState"]["intent"]["name"]
+    cursor = SearchCursor.loads((session_attributes or {}).get(SEARCH_CURSOR_ATTRIBUTE))
+    if cursor is None:
+        return close(
+            session_attributes or {},
+            intent_name,
+            "Fulfilled",
+            plain_text("Ask me for a recipe first."),
+        )
+
+    item, descriptors, mask = cursor.query
+    with request_metrics.stage("search"):
+        recipe, cursor = next_recipe(
+            item, descriptors, dietary_rules.diet_names(mask), cursor
+        )
+    return search_reply(
+        session_attributes,
+        intent_name,
+        recipe,
+        cursor,
+        "Sorry, I don't have any more recipes for that.",
+    )
+
 
-    print("Filtered results: ", filtered_dietary_results)
-    print("intent_request: ", intent_request)
-    if len(filtered_dietary_results) == 0:
+def search_reply(session_attributes, intent_name, recipe, cursor, no_match):
+    """
+    close with the recipe and keep the cursor in the session for the next
+    request. when the search ran out of budget before it found one, the
+    cursor is kept so asking again reads on. with every match shown, close
+    with no_match and drop the cursor, so asking again starts over
+    """
+    session_attributes = dict(session_attributes or {})
+    if recipe is None and cursor.position is not None:
+        session_attributes[SEARCH_CURSOR_ATTRIBUTE] = cursor.dumps()
         return close(
-            intent_request["sessionState"]["sessionAttributes"],
-            intent_request["sessionState"]["intent"]["name"],
+            session_attributes,
+            intent_name,
             "Fulfilled",
-            {
-                "contentType": "PlainText",
-                "content": "Sorry, we don't have any recipes for {} with a flavor of {}.".format(
-                    item["value"]["interpretedValue"],
-                    flavor["value"]["interpretedValue"],
-                ),
-            },
+            plain_text("I haven't found one yet, ask me again and I'll keep looking."),
         )
-    else:
-        random_index = get_random_recipe_index(len(filtered_dietary_results))
-        recipe = filtered_dietary_results[random_index]
-        title = recipe["title"]
-        ingredients = "\n".join(recipe["ingredients"])
-        directions = "\n".join(recipe["directions"])
-        source = recipe["link"]
+    if recipe is None:
+        session_attributes.pop(SEARCH_CURSOR_ATTRIBUTE, None)
+        return close(session_attributes, intent_name, "Fulfilled", plain_text(no_match))
+    session_attributes[SEARCH_CURSOR_ATTRIBUTE] = cursor.dumps()
+    with request_metrics.stage("render"):
+        return recipe_reply(
+            session_attributes, intent_name, recipe["Id"], recipe_messages(recipe), 0
+        )
+
 
-        message_content = f"Here's the recipe for {title}:\n\nIngredients:\n{ingredients}\n\nDirections:\n{directions}\n\nSource: {source}\n\n"
+def continue_recipe(intent_request):
+    """
+    send the next page of the recipe the last reply left unfinished
+    """
+    session_attributes = intent_request["sessionState"].get("sessionAttributes") or {}
+    intent_name = intent_request["sessionState"]["intent"]["name"]
+    recipe_id = session_attributes.get("recipe_id")
+    if not recipe_id:
+        return close(
+            session_attributes,
+            intent_name,
+            "Fulfilled",
+            plain_text("There is no recipe to continue. Ask me for a recipe first."),
+        )
 
+    with request_metrics.stage("continue_read"):
+        messages = stored_messages(recipe_id)
+    if messages is None:
         return close(
-            intent_request["sessionState"]["sessionAttributes"],
-            intent_request["sessionState"]["intent"]["name"],
+            session_attributes,
+            intent_name,
             "Fulfilled",
-            {
-                "contentType": "PlainText",
-                "content": message_content,
-            },
+            plain_text("Sorry, that recipe is no longer available."),
+        )
+    with request_metrics.stage("render"):
+        return recipe_reply(
+            session_attributes,
+            intent_name,
+            recipe_id,
+            messages,
+            safe_int(session_attributes.get("recipe_page")) or 0,
         )
 
 
@@ -511,15 +1284,15 @@ def dispatch(intent_request):
 
     intent_name = intent_request["sessionState"]["intent"]["name"]
 
-    logger.debug(
-        "dispatch sessionId={}, intentName={}".format(
-            intent_request["sessionId"], intent_name
-        )
-    )
+    log_event("dispatch", logging.DEBUG, intent=intent_name)
 
     # Dispatch to your bot's intent handlers
     if intent_name == "AskforRecipe":
         return ask_for_recipe(intent_request)
+    if intent_name == "ContinueRecipe":
+        return continue_recipe(intent_request)
+    if intent_name == "AnotherRecipe":
+        return another_recipe(intent_request)
 
     raise Exception(
         "Intent with name "
@@ -531,8 +1304,50 @@ def dispatch(intent_request):
 """ --- Main handler --- """
 
 
+def prewarm():
+    """
+    open the connection to DynamoDB during init, which does not count against
+    the Lex timeout of the first request. returns the time it took in ms
+    """
+    started = time.perf_counter()
+    try:
+        dynamodb_client.describe_table(TableName=KEYWORD_TABLE_NAME)
+    except Exception as error:
+        log_event("prewarm_failed", logging.WARNING, error=str(error))
+    return (time.perf_counter() - started) * 1000
+
+
+_prewarm_ms = prewarm() if PREWARM_CONNECTIONS else 0.0
+
+# logged by the first invocation of every container, so cold start regressions
+# show up in CloudWatch next to the Lambda INIT duration
+INIT_REPORT = {
+    "import_ms": round((_IMPORTS_DONE - _INIT_STARTED) * 1000, 2),
+    "prewarm_ms": round(_prewarm_ms, 2),
+    "init_ms": round((time.perf_counter() - _INIT_STARTED) * 1000, 2),
+}
+
+
 def lambda_handler(event, context):
-    logger.debug(f"Received event: {event}")
+    global _cold_start
+    start_request(
+        request_id=getattr(context, "aws_request_id", None),
+        session_id=event.get("sessionId"),
+    )
+    metrics = request_metrics.start_request()
+    if _cold_start:
+        _cold_start = False
+        log_event("cold_start", **INIT_REPORT)
+        metrics.count("cold_starts")
+
+    log_payload("received_event", lambda: event)
 
     intent_request = event
-    return dispatch(intent_request)
+    try:
+        with metrics.stage("total"):
+            return dispatch(intent_request)
+    finally:
+        request_metrics.flush(
+            Intent=try_ex(lambda: intent_request["sessionState"]["intent"]["name"])
+            or "unknown"
+        )
@@ -0,0 +1,43 @@
+import argparse
+import logging
+import os
+import time
+
+import importcsv
+
+# recipe_features.py is shared with the chatbot lambda at the repository root
+import repoRoot  # noqa: F401
+import recipe_features
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def feature_rows(recipes):
+    for recipe in recipes:
+        yield (recipe["Id"], *recipe_features.recipe_terms(recipe))
+
+
+def build_features(csv_path, features_path):
+    """
+    build the ingredient and title feature matrices from the RecipeNLG csv,
+    keyed by the same recipe Ids importcsv.py writes to DynamoDB
+    """
+    started = time.perf_counter()
+    with importcsv.open_recipes(csv_path) as recipes:
+        count = recipe_features.write_features(features_path, feature_rows(recipes))
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(features_path)
+    logger.info(
+        f"Wrote features for {count} recipes to {features_path} ({size} bytes) "
+        f"in {elapsed:.1f}s"
+    )
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the recipe feature matrices")
+    parser.add_argument("csv", help="RecipeNLG_dataset.csv or a snapshot")
+    parser.add_argument("features", help="where to write the features file")
+    args = parser.parse_args()
+    build_features(args.csv, args.features)
@@ -0,0 +1,48 @@
+import argparse
+import logging
+import os
+import time
+
+import importcsv
+
+# recipe_index.py sits next to the chatbot lambda at the repository root
+import repoRoot  # noqa: F401
+import recipe_index
+from recipe_keywords import split_keywords
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def index_entries(recipes):
+    for recipe in recipes:
+        yield dict(
+            recipe,
+            title_terms=split_keywords(recipe["title"]),
+            ner_terms=recipe["NER"] or [],
+        )
+
+
+def build_index(csv_path, index_path):
+    """
+    build the local search index for the chatbot lambda from the RecipeNLG csv.
+    recipe Ids are computed the same way importcsv.py computes them, so the
+    index points at the items stored in DynamoDB
+    """
+    started = time.perf_counter()
+    with importcsv.open_recipes(csv_path) as recipes:
+        count = recipe_index.write_index(index_path, index_entries(recipes))
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(index_path)
+    logger.info(
+        f"Indexed {count} recipes into {index_path} ({size} bytes) in {elapsed:.1f}s"
+    )
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the local recipe index")
+    parser.add_argument("csv", help="RecipeNLG_dataset.csv or a snapshot")
+    parser.add_argument("index", help="where to write the index file")
+    args = parser.parse_args()
+    build_index(args.csv, args.index)
@@ -0,0 +1,51 @@
+import argparse
+import logging
+import os
+import time
+from collections import Counter
+
+import importcsv
+
+# recipe_vocabulary.py sits next to the chatbot lambda at the repository root
+import repoRoot  # noqa: F401
+import recipe_vocabulary
+from recipe_keywords import split_keywords
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def keyword_counts(recipes):
+    """
+    number of titles each keyword appears in, the same keywords
+    createKeywords.py writes to the keyword table
+    """
+    counts = Counter()
+    for recipe in recipes:
+        counts.update(split_keywords(recipe["title"]))
+    return counts
+
+
+def build_vocabulary(csv_path, vocabulary_path, min_count=1):
+    started = time.perf_counter()
+    with importcsv.open_recipes(csv_path) as recipes:
+        counts = keyword_counts(recipes)
+    count = recipe_vocabulary.write_vocabulary(vocabulary_path, counts, min_count)
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(vocabulary_path)
+    logger.info(
+        f"Wrote {count} of {len(counts)} keywords to {vocabulary_path} "
+        f"({size} bytes) in {elapsed:.1f}s"
+    )
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the keyword spelling index")
+    parser.add_argument("csv", help="RecipeNLG_dataset.csv or a snapshot")
+    parser.add_argument("vocabulary", help="where to write the vocabulary file")
+    parser.add_argument(
+        "--min-count", type=int, default=1, help="leave out rarer keywords"
+    )
+    args = parser.parse_args()
+    build_vocabulary(args.csv, args.vocabulary, args.min_count)
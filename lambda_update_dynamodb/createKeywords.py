@@ -1,85 +1,106 @@
-import boto3
+import argparse
 import logging
-import time
-import re
+
+import dynamoUtils
+import scanEngine
+
+# recipe_keywords.py, dietary_rules.py and recipe_ranking.py are shared with
+# the chatbot lambda at the repository root
+import repoRoot  # noqa: F401
+import dietary_rules
+import recipe_ranking
+from recipe_keywords import split_keywords
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger()
 
-dynamodb = boto3.resource("dynamodb")
-source_table = dynamodb.Table("bakingrecipes4")
-target_table = dynamodb.Table("bakingrecipes4_keywordsv2")
-
-
-def copy_and_split_items():
-    last_evaluated_key = None
-    processed_items = 0
-
-    while True:
-        # Scan the source DynamoDB table with pagination
-        if last_evaluated_key:
-            response = source_table.scan(ExclusiveStartKey=last_evaluated_key)
-        else:
-            response = source_table.scan()
-
-        items = response["Items"]
-
-        # Iterate through the items and split the title into keywords
-        for item in items:
-            # Check if the item already has keywords
-            if item["scanned"] == False:
-                title = item["title"]
-                keywords = re.split(r"[\s()-]", title.lower())
-
-                # Create new items in the target table with separate keywords
-                for uncleanedkeyword in keywords:
-                    pattern = re.compile(
-                        r"^[\d&\-!#\\:,\(\)\*/?\"]*|[\d&\-!#\\:,\(\)\*/?\"]*$"
-                    )
-                    keyword = pattern.sub("", uncleanedkeyword)
-                    if (
-                        keyword == ""
-                        or keyword == "and"
-                        or keyword == "or"
-                        or keyword == "the"
-                        or keyword == "a"
-                        or keyword == "in"
-                    ):
-                        continue
-
-                    new_item = item.copy()
-                    new_item["Id"] = f"{new_item['Id']}_{keyword}"
-                    new_item["keywords"] = keyword
-                    logger.info(
-                        f"Creating new item with ID {new_item['Id']} - keyword: {keyword}"
-                    )
-
-                    # Insert the new record into the target table
-                    target_table.put_item(Item=new_item)
-                    source_table.update_item(
-                        Key={"Id": item["Id"]},
-                        UpdateExpression="SET scanned = :scanned",
-                        ExpressionAttributeValues={":scanned": True},
-                    )
-
-                    processed_items += 1
-            else:
-                logger.info(
-                    f"Skipping item with ID {item['Id']} - keywords already exist"
+source_table_name = "bakingrecipes4"
+target_table_name = "bakingrecipes4_keywordsv2"
+
+
+def keyword_items(item):
+    """
+    build one small posting per keyword. postings only carry what the search
+    needs to match titles and dietary restrictions and to rank the matches,
+    the full recipe is fetched by recipe_id afterwards. every posting is also
+    written to the "keyword#diet" partition of each selective restriction the
+    recipe satisfies (dietary_rules.PARTITIONED_DIETS), so a search with one
+    of those only reads compatible recipes
+    """
+    # recipes imported before these fields existed get them computed here
+    mask = item.get("diet_mask")
+    if mask is None:
+        mask = dietary_rules.diet_mask(item.get("NER"))
+    diets = set(dietary_rules.diet_names(int(mask)))
+    n_ingredients = item.get("n_ingredients")
+    if n_ingredients is None:
+        n_ingredients = recipe_ranking.ingredient_count(item)
+    directions_length = item.get("directions_length")
+    if directions_length is None:
+        directions_length = recipe_ranking.directions_length(item)
+
+    postings = []
+    for keyword in split_keywords(item["title"]):
+        posting = {
+            "Id": f"{item['Id']}_{keyword}",
+            "keywords": keyword,
+            "recipe_id": item["Id"],
+            "title": item["title"],
+            "n_ingredients": n_ingredients,
+            "directions_length": directions_length,
+        }
+        # DynamoDB does not store empty sets
+        if diets:
+            posting["diets"] = diets
+        postings.append(posting)
+        for diet in dietary_rules.PARTITIONED_DIETS:
+            if diet not in diets:
+                continue
+            postings.append(
+                dict(
+                    posting,
+                    Id=f"{posting['Id']}#{diet}",
+                    keywords=dietary_rules.diet_keyword(keyword, diet),
                 )
+            )
+    return postings
+
+
+def fan_out_page(dynamodb, items, stats):
+    """
+    fan a page of recipes out into keyword postings, 25 writes per
+    batch_write_item call. postings are overwritten, so pages can be redone
+    """
+    new_items = [new_item for item in items for new_item in keyword_items(item)]
+    dynamoUtils.put_items(dynamodb, target_table_name, new_items)
+    stats.add(processed=len(items), written=len(new_items))
+
+
+def copy_and_split_items(total_segments=scanEngine.default_segments):
+    """
+    backfill: write the postings of every recipe in the table over parallel
+    scan segments, one worker thread per segment. day to day the keyword table
+    is kept in sync by streamIndexer.py, this is only needed for recipes
+    written before the stream was enabled or to rebuild the keyword table
+    """
+    stats = scanEngine.ScanStats("Keywords")
 
-        # Check if there are more items to process
-        if "LastEvaluatedKey" in response:
-            last_evaluated_key = response["LastEvaluatedKey"]
-        else:
-            break
+    def handle_page(items):
+        fan_out_page(dynamoUtils.thread_resource(), items, stats)
 
-    logger.info(f"Processed a total of {processed_items} items")
-    return {"message": "Items copied and split successfully"}
+    scanEngine.parallel_scan(
+        source_table_name, handle_page, total_segments, stats=stats
+    )
+    return {"message": "Items copied and split successfully", **stats.snapshot()}
 
 
 def lambda_handler(event, context):
-    return copy_and_split_items()
+    total_segments = (event or {}).get("segments", scanEngine.default_segments)
+    return copy_and_split_items(total_segments)
 
 
-lambda_handler(None, None)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Split recipe titles into keywords")
+    parser.add_argument("--segments", type=int, default=scanEngine.default_segments)
+    args = parser.parse_args()
+    lambda_handler({"segments": args.segments}, None)
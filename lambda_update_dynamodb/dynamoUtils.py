@@ -0,0 +1,127 @@
+import random
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+# DynamoDB accepts at most 25 write requests per batch_write_item call
+# and 100 keys per batch_get_item call
+max_batch_size = 25
+max_get_batch_size = 100
+max_attempts = 10
+base_delay = 0.05
+max_delay = 5.0
+
+retryable_error_codes = {
+    "ProvisionedThroughputExceededException",
+    "ThrottlingException",
+    "RequestLimitExceeded",
+    "InternalServerError",
+}
+
+_local = threading.local()
+
+
+def thread_resource():
+    """
+    boto3 resources are not thread safe, so every worker thread gets its own session
+    """
+    if not hasattr(_local, "dynamodb"):
+        _local.dynamodb = boto3.session.Session().resource("dynamodb")
+    return _local.dynamodb
+
+
+def backoff_delay(attempt):
+    # exponential backoff with full jitter
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def is_retryable(error):
+    return (
+        isinstance(error, ClientError)
+        and error.response.get("Error", {}).get("Code") in retryable_error_codes
+    )
+
+
+def call_with_backoff(func, *args, **kwargs):
+    """
+    call func, sleeping and retrying while DynamoDB reports throttling
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args, **kwargs)
+        except ClientError as error:
+            if not is_retryable(error) or attempt >= max_attempts - 1:
+                raise
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+
+def chunks(items, size=max_batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def batch_write(dynamodb, table_name, requests):
+    """
+    send up to 25 write requests (PutRequest / DeleteRequest) in one call.
+    unprocessed items are resent with backoff until the whole batch is written
+    """
+    pending = {table_name: list(requests)}
+    attempt = 0
+    while pending:
+        sent = len(pending[table_name])
+        response = call_with_backoff(dynamodb.batch_write_item, RequestItems=pending)
+        pending = response.get("UnprocessedItems") or {}
+        if pending:
+            if len(pending[table_name]) < sent:
+                # some items went through, so the table is not fully throttled
+                attempt = 0
+            elif attempt >= max_attempts - 1:
+                raise RuntimeError(
+                    f"Gave up on {len(pending[table_name])} unprocessed items for {table_name}"
+                )
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
+
+
+def batch_get(dynamodb, table_name, keys, projection=None):
+    """
+    fetch items by key, up to 100 keys per call, retrying unprocessed keys with backoff
+    """
+    found = []
+    for key_batch in chunks(keys, max_get_batch_size):
+        request = {"Keys": key_batch}
+        if projection:
+            request["ProjectionExpression"] = projection
+        pending = {table_name: request}
+        attempt = 0
+        while pending:
+            response = call_with_backoff(dynamodb.batch_get_item, RequestItems=pending)
+            found.extend(response.get("Responses", {}).get(table_name, []))
+            pending = response.get("UnprocessedKeys") or {}
+            if pending:
+                if attempt >= max_attempts - 1:
+                    raise RuntimeError(f"Gave up on unprocessed keys for {table_name}")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+    return found
+
+
+def put_items(dynamodb, table_name, items):
+    """
+    write items in batches of 25, returns the number of items written
+    """
+    written = 0
+    for batch in chunks(items):
+        batch_write(dynamodb, table_name, [{"PutRequest": {"Item": i}} for i in batch])
+        written += len(batch)
+    return written
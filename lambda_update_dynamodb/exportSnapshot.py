@@ -0,0 +1,72 @@
+import argparse
+import logging
+import os
+import time
+
+import boto3
+
+import dynamoUtils
+import importcsv
+
+# recipe_snapshot.py is shared with the chatbot lambda at the repository root
+import repoRoot  # noqa: F401
+import recipe_snapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def iter_table(table_name):
+    """
+    page through the recipe table, one page of items in memory at a time
+    """
+    table = dynamoUtils.thread_resource().Table(table_name)
+    kwargs = {}
+    while True:
+        response = dynamoUtils.call_with_backoff(table.scan, **kwargs)
+        yield from response["Items"]
+        if "LastEvaluatedKey" not in response:
+            return
+        kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def export_snapshot(recipes, snapshot_path, compress=True, block_size=None):
+    started = time.perf_counter()
+    count = recipe_snapshot.write_snapshot(
+        snapshot_path,
+        recipes,
+        compress,
+        block_size or recipe_snapshot.DEFAULT_BLOCK_SIZE,
+    )
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(snapshot_path)
+    logger.info(
+        f"Wrote {count} recipes to {snapshot_path} ({size} bytes) in {elapsed:.1f}s"
+    )
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the recipe corpus snapshot")
+    parser.add_argument("snapshot", help="where to write the snapshot file")
+    parser.add_argument("--file", help="read a local csv instead of S3")
+    parser.add_argument(
+        "--from-table", action="store_true", help="read the DynamoDB recipe table"
+    )
+    parser.add_argument("--block-size", type=int, help="recipes per compressed block")
+    parser.add_argument("--no-compress", action="store_true")
+    args = parser.parse_args()
+
+    options = (args.snapshot, not args.no_compress, args.block_size)
+    if args.from_table:
+        export_snapshot(iter_table(importcsv.table_name), *options)
+    elif args.file:
+        with importcsv.open_recipes(args.file) as recipes:
+            export_snapshot(recipes, *options)
+    else:
+        s3 = boto3.client("s3")
+        lines = importcsv.open_s3_lines(s3, importcsv.bucket_name, importcsv.file_name)
+        try:
+            export_snapshot(importcsv.iter_recipes(lines), *options)
+        finally:
+            lines.close()
@@ -0,0 +1,54 @@
+import argparse
+import logging
+import sys
+import time
+
+# recipe_features.py and dietary_rules.py are shared with the chatbot lambda
+# at the repository root
+import repoRoot  # noqa: F401
+import dietary_rules
+import recipe_features
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+
+def filter_corpus(features_path, restrictions=(), terms=()):
+    """
+    Ids of every recipe in the corpus that satisfies the restrictions and has
+    every term in its title, computed over the whole feature matrix at once
+    """
+    started = time.perf_counter()
+    features = recipe_features.RecipeFeatures(features_path)
+    try:
+        rows = features.filter(restrictions, terms)
+        recipe_ids = features.recipe_ids(rows)
+        total = len(features)
+    finally:
+        rows = None
+        features.close()
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"{len(recipe_ids)} of {total} recipes match {list(restrictions)} "
+        f"{list(terms)} ({elapsed * 1000:.0f} ms)"
+    )
+    return recipe_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter the whole recipe corpus")
+    parser.add_argument("features", help="features file from buildFeatures.py")
+    parser.add_argument("--diet", default="", help='e.g. "vegan and gluten free"')
+    parser.add_argument("--terms", nargs="*", default=[], help="title keywords")
+    parser.add_argument("--output", help="write matching Ids here, one per line")
+    args = parser.parse_args()
+
+    restrictions = dietary_rules.parse_restrictions(args.diet)
+    unknown = dietary_rules.unknown_restrictions(restrictions)
+    if unknown:
+        parser.error(f"unknown dietary restrictions: {', '.join(unknown)}")
+
+    recipe_ids = filter_corpus(args.features, restrictions, args.terms)
+    with open(args.output, "w") if args.output else sys.stdout as out:
+        for recipe_id in recipe_ids:
+            out.write(f"{recipe_id}\n")
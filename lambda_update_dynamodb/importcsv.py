@@ -1,55 +1,518 @@
+import argparse
 import boto3
+import codecs
 import csv
+import hashlib
 import json
-import uuid
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 
-# Connect to AWS services
-dynamodb = boto3.resource("dynamodb")
-s3 = boto3.client("s3")
+import dynamoUtils
+import listParser
+
+# dietary_rules.py, recipe_ranking.py, recipe_render.py and recipe_snapshot.py
+# are shared with the chatbot lambda at the repository root
+import repoRoot  # noqa: F401
+import dietary_rules
+import recipe_ranking
+import recipe_render
+import recipe_snapshot
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
 
 # Define constants
 bucket_name = "bakingrecipes"
 file_name = "RecipeNLG_dataset.csv"
 table_name = "bakingrecipes4"
 partition_key = "Id"
+progress_interval = 10000
 
-# Read CSV file from S3 and convert to list of dictionaries
-csv_file = (
-    s3.get_object(Bucket=bucket_name, Key=file_name)["Body"]
-    .read()
-    .decode("utf-8")
-    .splitlines()
-)
-csv_reader = csv.DictReader(csv_file)
-data = []
-for row in csv_reader:
-    # Convert lists from strings to Python lists
-    list_delimiter = '", "'
-    if row["ingredients"] is not None:
-        row["ingredients"] = [
-            x.strip().strip('"') for x in row["ingredients"].strip("][").split(",")
-        ]
-    if row["directions"] is not None:
-        row["directions"] = [
-            x.strip().strip('"') for x in row["directions"].strip("][").split(",")
+# some RecipeNLG rows have directions longer than the csv module's default field limit
+csv.field_size_limit(2**31 - 1)
+
+
+def open_s3_lines(s3, bucket, key):
+    """
+    stream the object body from S3 and decode it as it is read.
+    only one read buffer is held in memory at a time, so this works for any file size.
+    s3 can be a boto3 client or any stand-in with a matching get_object method
+    """
+    body = s3.get_object(Bucket=bucket, Key=key)["Body"]
+    return codecs.getreader("utf-8")(body)
+
+
+def open_local_lines(path):
+    """
+    open a local copy of the dataset, useful for testing without S3
+    """
+    return open(path, newline="", encoding="utf-8")
+
+
+# csv columns holding list literals
+list_fields = ["ingredients", "directions", "NER"]
+# rows whose list columns are parsed together by iter_recipes
+parse_chunk_size = listParser.DEFAULT_CHUNK_SIZE
+# fields that make up the recipe itself, anything else is bookkeeping
+content_fields = ["title", "ingredients", "directions", "link", "source", "NER"]
+# fields computed at ingest for the chatbot's filters, ranking and replies
+derived_fields = ["diet_mask", "n_ingredients", "directions_length", "rendered"]
+
+
+def stable_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def recipe_id(row):
+    """
+    derive the Id from the source link and title. rows without a link fall back
+    to the recipe text, so the same recipe always gets the same Id
+    """
+    if row.get("link"):
+        return stable_hash(f"{row['link']}\n{row.get('title', '')}")
+    return stable_hash(
+        json.dumps(
+            [row.get("title"), row.get("ingredients"), row.get("directions")],
+            ensure_ascii=False,
+        )
+    )
+
+
+def content_hash(row):
+    # the derived fields are part of the hash, so an upsert after a change to
+    # the dietary rules, the ranking features or the rendered messages rewrites
+    # the affected recipes
+    return stable_hash(
+        json.dumps(
+            [row.get(field) for field in content_fields + derived_fields],
+            ensure_ascii=False,
+        )
+    )
+
+
+def changed_items(dynamodb, items):
+    """
+    drop items whose stored content_hash already matches, so an upsert only
+    writes new or changed recipes
+    """
+    items = list({item[partition_key]: item for item in items}.values())
+    stored = dynamoUtils.batch_get(
+        dynamodb,
+        table_name,
+        [{partition_key: item[partition_key]} for item in items],
+        projection=f"{partition_key}, content_hash",
+    )
+    stored_hashes = {s[partition_key]: s.get("content_hash") for s in stored}
+    return [
+        item
+        for item in items
+        if stored_hashes.get(item[partition_key]) != item["content_hash"]
+    ]
+
+
+def recipe_item(row):
+    """
+    turn one csv row into a dynamodb item
+    """
+    for field in list_fields:
+        # iter_recipes has already parsed the lists in bulk
+        if isinstance(row.get(field), str):
+            row[field] = listParser.parse_list(row[field])
+
+    row["diet_mask"] = dietary_rules.diet_mask(row["NER"])
+    row["n_ingredients"] = recipe_ranking.ingredient_count(row)
+    row["directions_length"] = recipe_ranking.directions_length(row)
+    row["rendered"] = recipe_render.render_messages(row)
+
+    # The Id and content hash only depend on the recipe, so re-imports overwrite
+    # the same items instead of adding another copy of the dataset
+    row[partition_key] = recipe_id(row)
+    row["content_hash"] = content_hash(row)
+
+    return row
+
+
+def parse_list_fields(rows):
+    """
+    parse the list columns of a chunk of rows, one parse_lists call per column
+    """
+    for field in list_fields:
+        present = [row for row in rows if row.get(field) is not None]
+        values = listParser.parse_lists(row[field] for row in present)
+        for row, value in zip(present, values):
+            row[field] = value
+
+
+def iter_recipes(lines):
+    """
+    lazily turn csv lines into dynamodb items, a chunk of rows at a time
+    """
+    rows = []
+    for row in csv.DictReader(lines):
+        rows.append(row)
+        if len(rows) == parse_chunk_size:
+            parse_list_fields(rows)
+            yield from map(recipe_item, rows)
+            rows = []
+    parse_list_fields(rows)
+    yield from map(recipe_item, rows)
+
+
+def snapshot_item(recipe):
+    """
+    turn a recipe read from a snapshot back into a dynamodb item
+    """
+    if not recipe["rendered"]:
+        # exported from a table imported before recipes were rendered
+        recipe["rendered"] = recipe_render.render_messages(recipe)
+    recipe["content_hash"] = content_hash(recipe)
+    return recipe
+
+
+@contextmanager
+def open_recipes(path):
+    """
+    iterate the items of a local csv or of a snapshot from exportSnapshot.py
+    """
+    if not recipe_snapshot.is_snapshot(path):
+        with open_local_lines(path) as lines:
+            yield iter_recipes(lines)
+        return
+
+    snapshot = recipe_snapshot.RecipeSnapshot(path)
+    try:
+        yield map(snapshot_item, snapshot.iter_recipes())
+    finally:
+        snapshot.close()
+
+
+def log_progress(count, started):
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Imported {count} rows in {elapsed:.1f}s ({rate:.0f} rows/sec)")
+
+
+def import_recipes(dynamodb, items, upsert=False):
+    """
+    write items to the table as they are produced instead of collecting them first.
+    with upsert, items that are already stored unchanged are skipped
+    """
+    count = 0
+    written = 0
+    started = time.perf_counter()
+    table = dynamodb.Table(table_name)
+    with table.batch_writer(overwrite_by_pkeys=[partition_key]) as batch:
+        for chunk in dynamoUtils.chunks(items, dynamoUtils.max_get_batch_size):
+            count += len(chunk)
+            if upsert:
+                chunk = changed_items(dynamodb, chunk)
+            for item in chunk:
+                batch.put_item(Item=item)
+            written += len(chunk)
+            if count % progress_interval < dynamoUtils.max_get_batch_size:
+                log_progress(count, started)
+
+    log_progress(count, started)
+    logger.info(f"Wrote {written} new or changed rows out of {count}")
+    return written
+
+
+def import_from_s3(s3, dynamodb, bucket, key, upsert=False):
+    lines = open_s3_lines(s3, bucket, key)
+    try:
+        return import_recipes(dynamodb, iter_recipes(lines), upsert)
+    finally:
+        lines.close()
+
+
+def import_from_file(dynamodb, path, upsert=False):
+    with open_recipes(path) as recipes:
+        return import_recipes(dynamodb, recipes, upsert)
+
+
+""" --- Sharded, resumable loader --- """
+
+# A source is {"path": local_file} or {"bucket": bucket, "key": key}.
+# Shards are byte ranges of the file. RecipeNLG keeps one recipe per line,
+# so a shard starts at the first full line after its start offset and owns
+# every line that starts before its end offset. A quoted field with a line
+# break in it would be cut in two at a shard boundary, so a line that is not
+# one whole row stops the import; load such a file without shards.
+
+read_chunk_size = 1024 * 1024
+
+
+def source_size(source):
+    if "path" in source:
+        return os.path.getsize(source["path"])
+    s3 = boto3.client("s3")
+    return s3.head_object(Bucket=source["bucket"], Key=source["key"])["ContentLength"]
+
+
+def open_byte_range(source, start):
+    """
+    open a binary stream positioned at byte start of the source
+    """
+    if "path" in source:
+        stream = open(source["path"], "rb")
+        stream.seek(start)
+        return stream
+    s3 = boto3.client("s3")
+    return s3.get_object(
+        Bucket=source["bucket"], Key=source["key"], Range=f"bytes={start}-"
+    )["Body"]
+
+
+def iter_byte_lines(stream):
+    """
+    yield raw lines with their line endings so callers can track byte offsets
+    """
+    pending = b""
+    while True:
+        chunk = stream.read(read_chunk_size)
+        if not chunk:
+            break
+        pending += chunk
+        lines = pending.split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + b"\n"
+    if pending:
+        yield pending
+
+
+def read_header(source):
+    """
+    returns the csv field names and the byte offset of the first data row
+    """
+    stream = open_byte_range(source, 0)
+    try:
+        header = next(iter_byte_lines(stream))
+    finally:
+        stream.close()
+    fieldnames = next(csv.reader([header.decode("utf-8")]))
+    return fieldnames, len(header)
+
+
+def plan_shards(data_start, size, shard_count):
+    shard_size = max(1, (size - data_start) // shard_count)
+    shards = []
+    start = data_start
+    while start < size:
+        end = min(size, start + shard_size)
+        if len(shards) == shard_count - 1:
+            end = size
+        shards.append({"start": start, "end": end})
+        start = end
+    return shards
+
+
+def checkpoint_path(checkpoint_dir, shard_number):
+    return os.path.join(checkpoint_dir, f"shard-{shard_number:04d}.json")
+
+
+def load_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_json(path, data):
+    # write to a temp file first so a crash never leaves a half written checkpoint
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def iter_shard_rows(source, fieldnames, offset, end, at_line_start):
+    """
+    yield (item, next_offset) for every line starting in [offset, end).
+    raises ValueError for a line that is not one whole csv row
+    """
+    position = offset if at_line_start else offset - 1
+    stream = open_byte_range(source, position)
+    try:
+        lines = iter_byte_lines(stream)
+        if not at_line_start:
+            # skip the line that belongs to the previous shard
+            position += len(next(lines, b""))
+        for line in lines:
+            if position >= end:
+                break
+            position += len(line)
+            text = line.decode("utf-8").rstrip("\r\n")
+            if not text:
+                continue
+            # a quoted field that goes on past the line break leaves an odd
+            # number of quotes, a line from the middle of one has the wrong
+            # number of fields
+            values = next(csv.reader([text]))
+            if text.count('"') % 2 or len(values) != len(fieldnames):
+                raise ValueError(
+                    f"the line at byte {position - len(line)} is not one csv row "
+                    f"of {len(fieldnames)} fields, a quoted field may span lines. "
+                    "the sharded import needs one row per line, import the file "
+                    "without --checkpoint-dir"
+                )
+            yield recipe_item(dict(zip(fieldnames, values))), position
+    finally:
+        stream.close()
+
+
+def load_shard(source, fieldnames, shard, shard_number, checkpoint_dir, upsert=False):
+    """
+    load one shard with its own batch writer, checkpointing after every batch
+    """
+    path = checkpoint_path(checkpoint_dir, shard_number)
+    checkpoint = load_json(path) or {
+        "start": shard["start"],
+        "end": shard["end"],
+        "offset": shard["start"],
+        "rows": 0,
+        "done": False,
+    }
+    if checkpoint["done"]:
+        return checkpoint["rows"]
+
+    dynamodb = dynamoUtils.thread_resource()
+    at_line_start = checkpoint["offset"] != shard["start"] or shard_number == 0
+    rows = iter_shard_rows(
+        source, fieldnames, checkpoint["offset"], shard["end"], at_line_start
+    )
+
+    started = time.perf_counter()
+    imported = 0
+    for batch in dynamoUtils.chunks(rows):
+        items = [item for item, _ in batch]
+        if upsert:
+            items = changed_items(dynamodb, items)
+        else:
+            items = list({item[partition_key]: item for item in items}.values())
+        if items:
+            dynamoUtils.batch_write(
+                dynamodb, table_name, [{"PutRequest": {"Item": i}} for i in items]
+            )
+        imported += len(items)
+        checkpoint["offset"] = batch[-1][1]
+        checkpoint["rows"] += len(batch)
+        save_json(path, checkpoint)
+        if imported % progress_interval < dynamoUtils.max_batch_size:
+            logger.info(f"Shard {shard_number}: {checkpoint['rows']} rows")
+
+    checkpoint["done"] = True
+    save_json(path, checkpoint)
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Shard {shard_number} finished: wrote {imported} rows in {elapsed:.1f}s"
+    )
+    return checkpoint["rows"]
+
+
+def sharded_import(
+    source, checkpoint_dir, shard_count=16, workers=8, processes=False, upsert=False
+):
+    """
+    split the csv into byte range shards and load them in parallel.
+    rerunning with the same checkpoint_dir resumes every unfinished shard
+    from its last written batch instead of starting over
+    """
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    plan_path = os.path.join(checkpoint_dir, "plan.json")
+    size = source_size(source)
+
+    plan = load_json(plan_path)
+    if plan is None or plan["size"] != size:
+        fieldnames, data_start = read_header(source)
+        plan = {
+            "size": size,
+            "fieldnames": fieldnames,
+            "shards": plan_shards(data_start, size, shard_count),
+        }
+        save_json(plan_path, plan)
+
+    executor_class = ProcessPoolExecutor if processes else ThreadPoolExecutor
+    started = time.perf_counter()
+    total = 0
+    with executor_class(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                load_shard,
+                source,
+                plan["fieldnames"],
+                shard,
+                number,
+                checkpoint_dir,
+                upsert,
+            )
+            for number, shard in enumerate(plan["shards"])
         ]
-    if row["NER"] is not None:
-        row["NER"] = [x.strip().strip('"') for x in row["NER"].strip("][").split(",")]
+        for future in as_completed(futures):
+            total += future.result()
+            log_progress(total, started)
+
+    return total
+
+
+def lambda_handler(event, context):
+    # Connect to AWS services
+    dynamodb = boto3.resource("dynamodb")
+    s3 = boto3.client("s3")
+    upsert = bool(event and event.get("upsert"))
 
-    row["scanned"] = False
+    count = import_from_s3(s3, dynamodb, bucket_name, file_name, upsert)
 
-    # Add unique Id to each item
-    row[partition_key] = str(uuid.uuid4())
+    # Print success message
+    print(
+        f"Data imported from S3 bucket {bucket_name} file {file_name} to DynamoDB table {table_name} with partition key {partition_key}."
+    )
+    return {"message": f"Imported {count} items"}
 
-    data.append(row)
 
-# Batch-write data to DynamoDB table
-table = dynamodb.Table(table_name)
-with table.batch_writer() as batch:
-    for item in data:
-        batch.put_item(Item=item)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import RecipeNLG into DynamoDB")
+    parser.add_argument(
+        "--file", help="import from a local csv or snapshot instead of S3"
+    )
+    parser.add_argument(
+        "--checkpoint-dir",
+        help="use the sharded parallel loader, keeping per shard checkpoints here",
+    )
+    parser.add_argument("--shards", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--processes", action="store_true", help="run shards in processes, not threads"
+    )
+    parser.add_argument(
+        "--upsert",
+        action="store_true",
+        help="only write rows that are new or whose content changed",
+    )
+    args = parser.parse_args()
 
-# Print success message
-print(
-    f"Data imported from S3 bucket {bucket_name} file {file_name} to DynamoDB table {table_name} with partition key {partition_key}."
-)
+    if args.checkpoint_dir:
+        if args.file:
+            source = {"path": args.file}
+        else:
+            source = {"bucket": bucket_name, "key": file_name}
+        count = sharded_import(
+            source,
+            args.checkpoint_dir,
+            args.shards,
+            args.workers,
+            args.processes,
+            args.upsert,
+        )
+        print(f"Imported {count} items to DynamoDB table {table_name}.")
+    elif args.file:
+        dynamodb = boto3.resource("dynamodb")
+        count = import_from_file(dynamodb, args.file, args.upsert)
+        print(
+            f"Imported {count} items from {args.file} to DynamoDB table {table_name}."
+        )
+    else:
+        lambda_handler({"upsert": args.upsert}, None)
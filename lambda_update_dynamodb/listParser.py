@@ -0,0 +1,94 @@
+"""
+Parser for the list columns of the RecipeNLG csv (ingredients, directions, NER).
+
+Once the csv module has unquoted them, the columns hold JSON style literals:
+    ["1 c. flour, sifted", "2 eggs", "Bake at 350\\u00b0."]
+Items can contain commas, quotes and backslash escapes, so splitting on "," is
+not safe. Well formed fields go through json.loads, which parses the whole
+field in one pass in C. Anything json rejects (single quoted or unquoted items,
+trailing commas, stray backslashes) goes through scan_list, a single regex pass
+that honours both quote styles and their escapes.
+"""
+import json
+import re
+
+# one item and the comma after it. quoted items may contain escaped quotes,
+# anything else runs up to the next comma
+_item = re.compile(
+    r"""\s*("(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|[^,]*?)\s*(?:,|$)""", re.DOTALL
+)
+_escape = re.compile(r"\\(.)", re.DOTALL)
+_decode = json.JSONDecoder().raw_decode
+
+# rows whose list columns are parsed together by importcsv.py
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def _unquote(token):
+    if len(token) < 2 or token[0] != token[-1] or token[0] not in "\"'":
+        return token
+    text = token[1:-1]
+    if "\\" not in text:
+        return text
+    if token[0] == '"':
+        try:
+            return json.loads(token)
+        except ValueError:
+            pass
+    return _escape.sub(r"\1", text)
+
+
+def scan_list(value):
+    """
+    parse a list literal in one pass, tolerating anything json would reject
+    """
+    body = value.strip()
+    if body.startswith("[") and body.endswith("]"):
+        body = body[1:-1]
+    items = []
+    position = 0
+    while position < len(body):
+        match = _item.match(body, position)
+        position = match.end()
+        token = match.group(1)
+        # an empty unquoted token is a trailing or doubled comma, not an item
+        if token:
+            items.append(_unquote(token))
+    return items
+
+
+def _is_string_list(value):
+    return type(value) is list and all(type(item) is str for item in value)
+
+
+def parse_list(value):
+    """
+    the items of one list column
+    """
+    try:
+        items = json.loads(value)
+    except ValueError:
+        return scan_list(value)
+    if _is_string_list(items):
+        return items
+    return scan_list(value)
+
+
+def parse_lists(values):
+    """
+    bulk mode: parse a chunk of fields with one shared decoder, skipping the
+    per call checks of json.loads. a field is only trusted when it decodes to
+    a single list of strings that ends exactly where the field ends, anything
+    else (surrounding whitespace, two lists in one field, single quotes) goes
+    through parse_list on its own
+    """
+    parsed = []
+    for value in values:
+        try:
+            items, end = _decode(value)
+        except ValueError:
+            items, end = None, -1
+        if end != len(value) or not _is_string_list(items):
+            items = parse_list(value)
+        parsed.append(items)
+    return parsed
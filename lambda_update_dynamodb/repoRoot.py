@@ -0,0 +1,10 @@
+"""
+Puts the repository root on sys.path, for the modules the scripts in this
+folder share with the chatbot lambda. Import it before them.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.append(ROOT)
@@ -0,0 +1,114 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import dynamoUtils
+
+logger = logging.getLogger()
+
+default_segments = 8
+progress_interval = 1000
+
+
+class ScanStats:
+    """
+    thread safe progress and throughput counters shared by all workers
+    """
+
+    def __init__(self, label="Scan"):
+        self.label = label
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.pages = 0
+        self.scanned = 0
+        self.processed = 0
+        self.written = 0
+        self.failed = 0
+
+    def add(self, pages=0, scanned=0, processed=0, written=0, failed=0):
+        with self.lock:
+            before = self.processed
+            self.pages += pages
+            self.scanned += scanned
+            self.processed += processed
+            self.written += written
+            self.failed += failed
+            if before // progress_interval != self.processed // progress_interval:
+                self.log()
+
+    def rate(self):
+        elapsed = time.perf_counter() - self.started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "pages": self.pages,
+                "scanned": self.scanned,
+                "processed": self.processed,
+                "written": self.written,
+                "failed": self.failed,
+                "elapsed": time.perf_counter() - self.started,
+                "items_per_sec": self.rate(),
+            }
+
+    def log(self):
+        elapsed = time.perf_counter() - self.started
+        logger.info(
+            f"{self.label}: {self.scanned} scanned, {self.processed} processed, "
+            f"{self.written} written, {self.failed} failed, {self.pages} pages "
+            f"in {elapsed:.1f}s ({self.rate():.0f} items/sec)"
+        )
+
+
+def scan_segment(table_name, segment, total_segments, handle_page, stats, scan_kwargs):
+    """
+    page through one scan segment, handing every page of items to handle_page
+    """
+    table = dynamoUtils.thread_resource().Table(table_name)
+    kwargs = dict(scan_kwargs or {}, Segment=segment, TotalSegments=total_segments)
+
+    while True:
+        response = dynamoUtils.call_with_backoff(table.scan, **kwargs)
+        stats.add(pages=1, scanned=len(response["Items"]))
+        handle_page(response["Items"])
+
+        # Check if there are more items to process
+        if "LastEvaluatedKey" in response:
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+        else:
+            break
+
+
+def parallel_scan(
+    table_name,
+    handle_page,
+    total_segments=default_segments,
+    scan_kwargs=None,
+    stats=None,
+):
+    """
+    scan the table with one thread per segment. handle_page is called from the
+    segment threads and should update stats with what it processed
+    """
+    stats = stats or ScanStats()
+    with ThreadPoolExecutor(max_workers=total_segments) as executor:
+        futures = [
+            executor.submit(
+                scan_segment,
+                table_name,
+                segment,
+                total_segments,
+                handle_page,
+                stats,
+                scan_kwargs,
+            )
+            for segment in range(total_segments)
+        ]
+        for future in futures:
+            future.result()
+
+    stats.log()
+    return stats
+
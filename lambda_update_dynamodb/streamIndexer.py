@@ -0,0 +1,158 @@
+import argparse
+import json
+import logging
+
+from boto3.dynamodb.types import TypeDeserializer
+
+import createKeywords
+import dynamoUtils
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger()
+
+target_table_name = createKeywords.target_table_name
+
+_deserializer = TypeDeserializer()
+
+
+def from_image(image):
+    """
+    convert a typed stream image into the values the boto3 resource returns
+    """
+    return {key: _deserializer.deserialize(value) for key, value in image.items()}
+
+
+def record_changes(record):
+    """
+    the keyword writes for one stream record: postings to put and posting Ids
+    to delete. the old image gives the postings that exist now, the new image
+    the ones that should, so only the difference is written
+    """
+    change = record["dynamodb"]
+    old = from_image(change.get("OldImage") or {})
+    new = from_image(change.get("NewImage") or {})
+    if record["eventName"] != "INSERT" and not old:
+        logger.warning(
+            f"{record['eventName']} for {change.get('Keys')} has no old image, "
+            "stale keywords cannot be removed (the stream needs NEW_AND_OLD_IMAGES)"
+        )
+    old_postings = {}
+    if old:
+        old_postings = {p["Id"]: p for p in createKeywords.keyword_items(old)}
+    new_postings = {}
+    if record["eventName"] != "REMOVE" and new:
+        new_postings = {p["Id"]: p for p in createKeywords.keyword_items(new)}
+
+    puts = [p for i, p in new_postings.items() if old_postings.get(i) != p]
+    deletes = [i for i in old_postings if i not in new_postings]
+    return puts, deletes
+
+
+def apply_records(dynamodb, records):
+    """
+    apply a batch of stream records to the keyword table and return the index
+    of the first record that was not fully applied, or None.
+
+    writes are coalesced by posting Id, the last record wins, so one batch
+    never sends two requests for the same key. puts overwrite and deletes of
+    missing keys do nothing, so replaying records is safe. every write
+    remembers the first record it came from, and when a write fails the batch
+    is reported as failed from that record on
+    """
+    requests = {}
+    first_record = {}
+    failed = None
+    for number, record in enumerate(records):
+        try:
+            puts, deletes = record_changes(record)
+        except Exception as error:
+            logger.error(f"Cannot index record {record.get('eventID')}: {error}")
+            failed = number
+            break
+        for posting in puts:
+            requests[posting["Id"]] = {"PutRequest": {"Item": posting}}
+            first_record.setdefault(posting["Id"], number)
+        for posting_id in deletes:
+            requests[posting_id] = {"DeleteRequest": {"Key": {"Id": posting_id}}}
+            first_record.setdefault(posting_id, number)
+
+    keys = list(requests)
+    written = 0
+    for batch in dynamoUtils.chunks(keys):
+        try:
+            dynamoUtils.batch_write(
+                dynamodb, target_table_name, [requests[key] for key in batch]
+            )
+        except Exception as error:
+            logger.error(f"Keyword write failed: {error}")
+            unwritten = min(first_record[key] for key in keys[written:])
+            failed = unwritten if failed is None else min(failed, unwritten)
+            break
+        written += len(batch)
+
+    puts = sum("PutRequest" in request for request in requests.values())
+    logger.info(
+        f"Indexed {len(records) if failed is None else failed} of {len(records)} "
+        f"records: {puts} keyword puts, {len(requests) - puts} deletes, "
+        f"{written} writes sent"
+    )
+    return failed
+
+
+def lambda_handler(event, context):
+    """
+    entry point for a DynamoDB Streams event source mapping with
+    ReportBatchItemFailures. lambda retries the batch from the first reported
+    sequence number, records before it are not sent again
+    """
+    records = event.get("Records") or []
+    failed = apply_records(dynamoUtils.thread_resource(), records)
+    if failed is None:
+        return {"batchItemFailures": []}
+    sequence_number = records[failed]["dynamodb"]["SequenceNumber"]
+    return {"batchItemFailures": [{"itemIdentifier": sequence_number}]}
+
+
+class DryRunResource:
+    """
+    stands in for the DynamoDB resource when replaying locally, prints the
+    writes instead of sending them
+    """
+
+    def batch_write_item(self, RequestItems):
+        for table_name, requests in RequestItems.items():
+            for request in requests:
+                if "PutRequest" in request:
+                    key = request["PutRequest"]["Item"]["Id"]
+                    logger.info(f"put {table_name} {key}")
+                else:
+                    key = request["DeleteRequest"]["Key"]["Id"]
+                    logger.info(f"delete {table_name} {key}")
+        return {"UnprocessedItems": {}}
+
+
+def load_records(path):
+    """
+    a recorded batch is either a stream event {"Records": [...]} or a list of
+    records
+    """
+    with open(path, encoding="utf-8") as f:
+        batch = json.load(f)
+    return batch["Records"] if isinstance(batch, dict) else batch
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay recorded DynamoDB stream batches into the keyword table"
+    )
+    parser.add_argument("batches", nargs="+", help="json files of stream records")
+    parser.add_argument(
+        "--dry-run", action="store_true", help="log the writes instead of sending them"
+    )
+    args = parser.parse_args()
+    dynamodb = DryRunResource() if args.dry_run else dynamoUtils.thread_resource()
+    for path in args.batches:
+        records = load_records(path)
+        failed = apply_records(dynamodb, records)
+        if failed is not None:
+            raise SystemExit(f"{path}: failed from record {failed}")
@@ -0,0 +1,250 @@
+"""
+Container level cache for the chatbot lambda, kept in /tmp.
+
+/tmp outlives single invocations (and a re-init of the same execution
+environment), so everything kept there is shared by every request a warm
+container serves:
+
+- recipe files (index, spelling index, snapshot) downloaded from S3 on first
+  use. a copy is only used when its header has the magic and version the
+  code reads and its stamp matches the object's ETag, otherwise it is fetched
+  again. downloads land in a temporary file and are renamed into place, so a
+  reader never maps a partial file.
+- HotRecipeStore, full recipes read from DynamoDB in a memory-mapped file of
+  bounded size. one process at a time owns it, through a lock file held for
+  as long as the store is open.
+
+Hot recipe file layout, little endian:
+    header      magic b"RBHR", version
+    records     uint32 key length, uint32 value length, key, value
+"""
+import fcntl
+import mmap
+import os
+import struct
+from collections import OrderedDict
+
+import recipe_index
+
+MAGIC = b"RBHR"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sI")
+_RECORD = struct.Struct("<II")
+
+
+def parse_s3_url(url):
+    """
+    (bucket, key) of an s3://bucket/key url
+    """
+    if not url.startswith("s3://") or "/" not in url[5:]:
+        raise ValueError(f"not an s3://bucket/key url: {url!r}")
+    bucket, key = url[5:].split("/", 1)
+    return bucket, key
+
+
+def has_stamp(path, magic, version):
+    try:
+        return recipe_index.read_header(path) == (magic, version)
+    except (OSError, struct.error):
+        return False
+
+
+def _read_text(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def cached_file(s3, url, directory, magic, version):
+    """
+    the local path of the recipe file at url and whether it was "cached",
+    "downloaded" or kept "unchecked" because S3 could not be asked for the
+    object's ETag. raises when there is no usable copy
+    """
+    bucket, key = parse_s3_url(url)
+    path = os.path.join(directory, os.path.basename(key))
+    etag_path = path + ".etag"
+    valid = has_stamp(path, magic, version)
+    try:
+        etag = s3.head_object(Bucket=bucket, Key=key)["ETag"]
+    except Exception:
+        if valid:
+            return path, "unchecked"
+        raise
+    if valid and _read_text(etag_path) == etag:
+        return path, "cached"
+
+    os.makedirs(directory, exist_ok=True)
+    partial = path + ".partial"
+    s3.download_file(bucket, key, partial)
+    if not has_stamp(partial, magic, version):
+        os.remove(partial)
+        raise ValueError(f"{url} is not a version {version} {magic!r} file")
+    # a copy that is still mapped keeps its pages after the rename
+    os.replace(partial, path)
+    with open(etag_path, "w", encoding="utf-8") as f:
+        f.write(etag)
+    return path, "downloaded"
+
+
+class HotRecipeStore:
+    """
+    values by key in an append-only file, read back through a memory map so
+    they stay out of the Python heap. at most max_bytes of records are kept:
+    past that the file is rewritten with only the most recently used entries,
+    up to half of max_bytes. a file left by an earlier init of the container
+    is reused when its stamp matches, a torn last record is dropped.
+
+    the store is not shared: opening it takes an exclusive lock on path +
+    ".lock" and raises BlockingIOError while another process holds it
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        # key -> (value offset, value length), least recently used first
+        self.entries = OrderedDict()
+        self.mapped = None
+        self.file = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.lock = open(path + ".lock", "a+b")
+        try:
+            fcntl.flock(self.lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            self.lock.close()
+            raise
+        if has_stamp(path, MAGIC, VERSION):
+            self._load()
+            self.file = open(path, "r+b")
+        else:
+            self.file = self._create(path)
+        self.file.seek(0, os.SEEK_END)
+        self.size = self.file.tell()
+
+    @staticmethod
+    def _create(path):
+        f = open(path, "w+b")
+        f.write(_HEADER.pack(MAGIC, VERSION))
+        f.flush()
+        return f
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            data = f.read()
+        position = _HEADER.size
+        while position + _RECORD.size <= len(data):
+            key_length, value_length = _RECORD.unpack_from(data, position)
+            start = position + _RECORD.size
+            end = start + key_length + value_length
+            if end > len(data):
+                break
+            key = data[start : start + key_length].decode("utf-8")
+            self.entries[key] = (start + key_length, value_length)
+            self.entries.move_to_end(key)
+            position = end
+        if position != len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(position)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def _view(self, offset, length):
+        if self.mapped is None or offset + length > len(self.mapped):
+            if self.mapped is not None:
+                self.mapped.close()
+            self.file.flush()
+            self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self.mapped[offset : offset + length]
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return self._view(*entry)
+
+    def discard(self, key):
+        """
+        forget a value that turned out to be unusable and count the lookup as
+        a miss. its bytes stay in the file until the next eviction
+        """
+        if self.entries.pop(key, None) is not None:
+            self.hits -= 1
+            self.misses += 1
+
+    def put(self, key, value):
+        encoded = key.encode("utf-8")
+        record = _RECORD.pack(len(encoded), len(value)) + encoded + value
+        if len(record) > self.max_bytes // 2:
+            return
+        self.file.seek(0, os.SEEK_END)
+        self.file.write(record)
+        self.entries[key] = (self.size + _RECORD.size + len(encoded), len(value))
+        self.entries.move_to_end(key)
+        self.size += len(record)
+        if self.size > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """
+        rewrite the file with the most recently used entries that fit in half
+        of max_bytes
+        """
+        kept = []
+        budget = self.max_bytes // 2 - _HEADER.size
+        for key in reversed(self.entries):
+            _, length = self.entries[key]
+            size = _RECORD.size + len(key.encode("utf-8")) + length
+            if size > budget:
+                break
+            budget -= size
+            kept.append((key, self._view(*self.entries[key])))
+
+        compacted = self._create(self.path + ".compact")
+        entries = OrderedDict()
+        for key, value in reversed(kept):
+            encoded = key.encode("utf-8")
+            offset = compacted.tell() + _RECORD.size + len(encoded)
+            compacted.write(_RECORD.pack(len(encoded), len(value)) + encoded + value)
+            entries[key] = (offset, len(value))
+        compacted.flush()
+        os.replace(self.path + ".compact", self.path)
+
+        self.evictions += len(self.entries) - len(entries)
+        self._close_file()
+        self.file = compacted
+        self.entries = entries
+        self.size = compacted.tell()
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self.entries),
+            "bytes": self.size,
+        }
+
+    def _close_file(self):
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+        self.file.close()
+
+    def close(self):
+        if self.file is not None:
+            self._close_file()
+        # closing the lock file releases the lock
+        self.lock.close()
@@ -0,0 +1,193 @@
+"""
+Columnar ingredient and title features for filtering recipes in bulk.
+
+Every recipe is a row of two sparse boolean matrices in CSR form, one over the
+NER ingredient vocabulary and one over the title keyword vocabulary. Dietary
+exclusions and multi-term flavor matching then run as a few NumPy operations
+over thousands of candidate rows at once instead of a Python loop per recipe.
+
+The file is built by lambda_update_dynamodb/buildFeatures.py and uses the
+section layout of recipe_index.py:
+    ids                 fixed width recipe Ids, rows are sorted by Id
+    <field>.vocab       sorted string table of the field's terms
+    <field>.indptr      uint64, n + 1 row offsets into <field>.indices
+    <field>.indices     uint32 column numbers, sorted within each row
+for the fields "ner" and "title". NumPy is needed to read the file.
+"""
+import numpy as np
+
+import dietary_rules
+import recipe_index
+from recipe_keywords import clean_keyword, split_keywords
+
+MAGIC = b"RBFM"
+VERSION = 3
+FIELDS = ("ner", "title")
+
+
+def recipe_terms(recipe):
+    """
+    the (ner_terms, title_terms) stored for one recipe
+    """
+    ner = {dietary_rules.normalize_ingredient(i) for i in recipe.get("NER") or []}
+    ner.discard("")
+    return ner, set(split_keywords(recipe["title"]))
+
+
+def write_features(path, recipes):
+    """
+    recipes yields (recipe_id, ner_terms, title_terms). a recipe Id that comes
+    back again replaces the earlier row, like a put to the recipe table
+    """
+    rows = {recipe_id: (ner, title) for recipe_id, ner, title in recipes}
+    ids = sorted(rows, key=lambda i: i.encode("utf-8"))
+    encoded = [i.encode("utf-8") for i in ids]
+    width = max(map(len, encoded), default=1)
+    sections = [("ids", np.array(encoded, dtype=f"S{width}").tobytes())]
+
+    for position, field in enumerate(FIELDS):
+        vocabulary = sorted(
+            {term for terms in rows.values() for term in terms[position]},
+            key=lambda t: t.encode("utf-8"),
+        )
+        columns = {term: column for column, term in enumerate(vocabulary)}
+        indptr = np.zeros(len(ids) + 1, dtype="<u8")
+        indices = []
+        for row, recipe_id in enumerate(ids):
+            indices.extend(sorted(columns[t] for t in rows[recipe_id][position]))
+            indptr[row + 1] = len(indices)
+
+        offsets, heap = recipe_index.string_table(vocabulary)
+        sections += [
+            (f"{field}.vocab.offsets", offsets),
+            (f"{field}.vocab.heap", heap),
+            (f"{field}.indptr", indptr.tobytes()),
+            (f"{field}.indices", np.array(indices, dtype="<u4").tobytes()),
+        ]
+
+    recipe_index.write_sections(path, MAGIC, VERSION, sections)
+    return len(ids)
+
+
+class RecipeFeatures:
+    def __init__(self, path):
+        self.path = path
+        self.mapped, sections = recipe_index.read_sections(path, MAGIC, VERSION)
+        self.vocabulary = {}
+        self.indptr = {}
+        self.indices = {}
+        for field in FIELDS:
+            self.vocabulary[field] = recipe_index.StringTable(
+                sections[f"{field}.vocab.offsets"], sections[f"{field}.vocab.heap"]
+            )
+            self.indptr[field] = np.frombuffer(sections[f"{field}.indptr"], "<u8")
+            self.indices[field] = np.frombuffer(sections[f"{field}.indices"], "<u4")
+        count = len(self.indptr["ner"]) - 1
+        width = len(sections["ids"]) // count if count else 1
+        self.ids = np.frombuffer(sections["ids"], f"S{width}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def recipe_id(self, row):
+        return self.ids[row].decode("utf-8")
+
+    def recipe_ids(self, rows):
+        return [i.decode("utf-8") for i in self.ids[rows]]
+
+    def rows_for(self, recipe_ids):
+        """
+        rows of the given recipe Ids in one vectorized lookup, in input order.
+        Ids that are not in the file are left out
+        """
+        width = self.ids.dtype.itemsize
+        keys = [i.encode("utf-8") for i in recipe_ids]
+        keys = np.array([k for k in keys if len(k) <= width], dtype=self.ids.dtype)
+        if not len(keys) or not len(self):
+            return np.zeros(0, dtype=np.int64)
+        rows = np.minimum(np.searchsorted(self.ids, keys), len(self) - 1)
+        return rows[self.ids[rows] == keys]
+
+    def term_counts(self, field="ner", rows=None):
+        """
+        number of distinct terms per row, the ingredient count for "ner"
+        """
+        lengths = np.diff(self.indptr[field]).astype(np.int64)
+        return lengths if rows is None else lengths[rows]
+
+    def column_mask(self, terms, field):
+        """
+        boolean mask over the field's vocabulary, and how many terms were found
+        """
+        mask = np.zeros(len(self.vocabulary[field]), dtype=bool)
+        found = 0
+        for term in set(terms):
+            column = self.vocabulary[field].find(term)
+            if column is not None:
+                mask[column] = True
+                found += 1
+        return mask, found
+
+    def row_hits(self, field, mask, rows=None):
+        """
+        for each row, how many of its terms are set in the column mask
+        """
+        indptr = self.indptr[field].astype(np.int64)
+        indices = self.indices[field]
+        if rows is None:
+            starts, lengths = indptr[:-1], np.diff(indptr)
+            positions = None
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+            starts = indptr[rows]
+            lengths = indptr[rows + 1] - starts
+            # the stored entries of every selected row, one row after another
+            ends = np.cumsum(lengths)
+            positions = np.repeat(starts - ends + lengths, lengths)
+            positions += np.arange(positions.size)
+
+        hits = mask[indices if positions is None else indices[positions]]
+        totals = np.zeros(hits.size + 1, dtype=np.int64)
+        np.cumsum(hits, out=totals[1:])
+        ends = np.cumsum(lengths)
+        return totals[ends] - totals[ends - lengths]
+
+    def allowed(self, restrictions, rows=None):
+        """
+        boolean per row, True when no NER ingredient is banned by the restrictions
+        """
+        count = len(self) if rows is None else len(rows)
+        banned = dietary_rules.banned_ingredients(tuple(restrictions))
+        if not banned:
+            return np.ones(count, dtype=bool)
+        mask, found = self.column_mask(banned, "ner")
+        if not found:
+            return np.ones(count, dtype=bool)
+        return self.row_hits("ner", mask, rows) == 0
+
+    def has_terms(self, terms, rows=None):
+        """
+        boolean per row, True when the title has every term as a keyword
+        """
+        count = len(self) if rows is None else len(rows)
+        terms = {clean_keyword(t) for t in terms} - {""}
+        if not terms:
+            return np.ones(count, dtype=bool)
+        mask, found = self.column_mask(terms, "title")
+        if found < len(terms):
+            return np.zeros(count, dtype=bool)
+        return self.row_hits("title", mask, rows) == found
+
+    def filter(self, restrictions=(), terms=(), rows=None):
+        """
+        the rows (all rows, or the given candidates) that satisfy every
+        restriction and have every term in the title
+        """
+        keep = self.allowed(restrictions, rows) & self.has_terms(terms, rows)
+        selected = np.arange(len(self)) if rows is None else np.asarray(rows, np.int64)
+        return selected[keep]
+
+    def close(self):
+        self.ids = self.vocabulary = None
+        self.indptr, self.indices = {}, {}
+        self.mapped.close()
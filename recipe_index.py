@@ -0,0 +1,299 @@
+"""
+Compact, memory-mappable inverted index over recipe titles and NER ingredients.
+
+The file is built offline by lambda_update_dynamodb/buildIndex.py and shipped with
+the lambda (or in a layer). Opening it only maps the file, so pages are read
+from disk the first time a lookup touches them and no lookup does network I/O.
+
+Layout, all integers little endian:
+    header      magic b"RBIX", version, section count
+    directory   (name, offset, length) for every section
+    sections    8 byte aligned arrays and utf-8 string heaps
+
+A string table is an offsets section (uint64, n + 1 entries) plus a heap
+section, string i is heap[offsets[i]:offsets[i + 1]]. Each field ("title",
+"ner") has a sorted term table and, per term, a run of uint32 recipe
+ordinals in the postings section. The "diets", "ingredient_counts" and
+"directions_lengths" sections hold one uint32 per recipe ordinal for the
+dietary filter and the ranking.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+MAGIC = b"RBIX"
+VERSION = 5
+FIELDS = ("title", "ner")
+# per recipe uint32 columns and the recipe fields they are read from
+COLUMNS = {
+    "diets": "diet_mask",
+    "ingredient_counts": "n_ingredients",
+    "directions_lengths": "directions_length",
+}
+
+_HEADER = struct.Struct("<4sII")
+_SECTION = struct.Struct("<24sQQ")
+
+
+def _pad(f):
+    f.write(b"\0" * (-f.tell() % 8))
+
+
+def little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def string_table(strings):
+    offsets = array("Q", [0])
+    heap = bytearray()
+    for s in strings:
+        heap += s.encode("utf-8")
+        offsets.append(len(heap))
+    return little_endian(offsets).tobytes(), bytes(heap)
+
+
+def write_sections(path, magic, version, sections):
+    """
+    write named byte sections behind a small directory, 8 byte aligned so
+    readers can cast them to arrays in place. data is bytes or an iterable of
+    byte chunks, so large sections can be streamed from temporary files
+    """
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(magic, version, len(sections)))
+        directory_start = f.tell()
+        f.write(b"\0" * (_SECTION.size * len(sections)))
+        directory = []
+        for name, data in sections:
+            if len(name.encode("ascii")) > _SECTION.size - 16:
+                raise ValueError(f"section name {name!r} is too long")
+            _pad(f)
+            offset = f.tell()
+            if isinstance(data, (bytes, bytearray)):
+                f.write(data)
+            else:
+                for chunk in data:
+                    f.write(chunk)
+            directory.append((name, offset, f.tell() - offset))
+
+        f.seek(directory_start)
+        for name, offset, length in directory:
+            f.write(_SECTION.pack(name.encode("ascii"), offset, length))
+
+
+def read_header(path):
+    """
+    the (magic, version) stamp of a recipe file, without mapping it
+    """
+    with open(path, "rb") as f:
+        magic, version, _ = _HEADER.unpack(f.read(_HEADER.size))
+    return magic, version
+
+
+def read_sections(path, magic, version):
+    """
+    map the file and return (mmap, {name: memoryview}).
+    the views must be released before the mmap can be closed
+    """
+    if sys.byteorder != "little":
+        raise RuntimeError("recipe files are little endian")
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    file_magic, file_version, count = _HEADER.unpack_from(mapped, 0)
+    if file_magic != magic or file_version != version:
+        mapped.close()
+        raise ValueError(f"{path} is not a version {version} {magic!r} file")
+
+    sections = {}
+    for i in range(count):
+        name, offset, length = _SECTION.unpack_from(
+            mapped, _HEADER.size + i * _SECTION.size
+        )
+        sections[name.rstrip(b"\0").decode("ascii")] = memoryview(mapped)[
+            offset : offset + length
+        ]
+    return mapped, sections
+
+
+def write_index(path, recipes):
+    """
+    recipes yields dicts with "Id", "title", "title_terms", "ner_terms" and the
+    COLUMNS fields. postings are sorted recipe ordinals, so they can be
+    intersected cheaply
+    """
+    ids = []
+    titles = []
+    columns = {name: array("I") for name in COLUMNS}
+    postings = {field: {} for field in FIELDS}
+    for ordinal, recipe in enumerate(recipes):
+        ids.append(recipe["Id"])
+        titles.append(recipe["title"])
+        for name, key in COLUMNS.items():
+            columns[name].append(recipe[key])
+        for field in FIELDS:
+            for term in set(t.strip().lower() for t in recipe[f"{field}_terms"]):
+                if term:
+                    postings[field].setdefault(term, array("I")).append(ordinal)
+
+    sections = []
+    for name, strings in (("ids", ids), ("titles", titles)):
+        offsets, heap = string_table(strings)
+        sections += [(f"{name}.offsets", offsets), (f"{name}.heap", heap)]
+    for name in COLUMNS:
+        sections.append((name, little_endian(columns[name]).tobytes()))
+
+    for field in FIELDS:
+        terms = sorted(postings[field], key=lambda t: t.encode("utf-8"))
+        offsets, heap = string_table(terms)
+        posting_offsets = array("Q", [0])
+        all_postings = array("I")
+        for term in terms:
+            all_postings.extend(postings[field][term])
+            posting_offsets.append(len(all_postings))
+        sections += [
+            (f"{field}.terms.offsets", offsets),
+            (f"{field}.terms.heap", heap),
+            (f"{field}.postings.offsets", little_endian(posting_offsets).tobytes()),
+            (f"{field}.postings", little_endian(all_postings).tobytes()),
+        ]
+
+    write_sections(path, MAGIC, VERSION, sections)
+    return len(ids)
+
+
+class StringTable:
+    def __init__(self, offsets, heap):
+        self.offsets = offsets.cast("Q")
+        self.heap = heap
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.raw(i).decode("utf-8")
+
+    def raw(self, i):
+        return bytes(self.heap[self.offsets[i] : self.offsets[i + 1]])
+
+    def find(self, term):
+        """
+        position of term in a table sorted by utf-8 bytes, or None
+        """
+        key = term.encode("utf-8")
+        terms = _SortedTerms(self)
+        i = bisect_left(terms, key)
+        if i < len(terms) and terms[i] == key:
+            return i
+        return None
+
+
+class _SortedTerms:
+    # lets bisect search the term heap without decoding every term
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, i):
+        return self.table.raw(i)
+
+
+class RecipeIndex:
+    def __init__(self, path):
+        self.path = path
+        self.mapped, sections = read_sections(path, MAGIC, VERSION)
+        self.ids = StringTable(sections["ids.offsets"], sections["ids.heap"])
+        self.titles = StringTable(sections["titles.offsets"], sections["titles.heap"])
+        self.columns = {name: sections[name].cast("I") for name in COLUMNS}
+        self.terms = {}
+        self.posting_offsets = {}
+        self.postings_data = {}
+        for field in FIELDS:
+            self.terms[field] = StringTable(
+                sections[f"{field}.terms.offsets"], sections[f"{field}.terms.heap"]
+            )
+            offsets = sections[f"{field}.postings.offsets"]
+            self.posting_offsets[field] = offsets.cast("Q")
+            self.postings_data[field] = sections[f"{field}.postings"].cast("I")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def recipe_id(self, ordinal):
+        return self.ids[ordinal]
+
+    def title(self, ordinal):
+        return self.titles[ordinal]
+
+    def diet_mask(self, ordinal):
+        return self.columns["diets"][ordinal]
+
+    def features(self, ordinal):
+        """
+        the COLUMNS fields of one recipe, keyed like the recipe item
+        """
+        return {key: self.columns[name][ordinal] for name, key in COLUMNS.items()}
+
+    def document_frequency(self, term, field="title"):
+        return len(self.postings(term, field))
+
+    def average_terms(self, field="title"):
+        """
+        average number of distinct terms per recipe
+        """
+        if not len(self):
+            return 0.0
+        return self.posting_offsets[field][-1] / len(self)
+
+    def has_term(self, term, field="title"):
+        return self._term_position(term, field) is not None
+
+    def _term_position(self, term, field):
+        return self.terms[field].find(term.lower())
+
+    def postings(self, term, field="title"):
+        """
+        sorted recipe ordinals containing term, as a zero copy view
+        """
+        i = self._term_position(term, field)
+        if i is None:
+            return self.postings_data[field][0:0]
+        offsets = self.posting_offsets[field]
+        return self.postings_data[field][offsets[i] : offsets[i + 1]]
+
+    def search(self, terms, field="title"):
+        """
+        ordinals of recipes containing every term, rarest term first
+        """
+        lists = sorted((self.postings(t, field) for t in terms), key=len)
+        if not lists:
+            return []
+        result = lists[0].tolist()
+        for other in lists[1:]:
+            result = _intersect_sorted(result, other)
+            if not result:
+                break
+        return result
+
+    def close(self):
+        self.ids = self.titles = None
+        self.columns = {}
+        self.terms, self.posting_offsets, self.postings_data = {}, {}, {}
+        self.mapped.close()
+
+
+def _intersect_sorted(small, large):
+    # binary search each entry of the small list in the large mapped list
+    result = []
+    low = 0
+    for value in small:
+        low = bisect_left(large, value, low)
+        if low == len(large):
+            break
+        if large[low] == value:
+            result.append(value)
+    return result
@@ -0,0 +1,63 @@
+"""
+Title keyword rules shared by the ingest scripts and the chatbot lambda, so the
+terms that are looked up are always cleaned the same way as the terms that were
+indexed. Keywords are stemmed with a few plural rules, so "cookie", "cookies"
+and "Cookies" all become the same index term.
+"""
+import re
+
+keyword_separator = re.compile(r"[\s()-]")
+keyword_trim = re.compile(r"^[\d&\-!#\\:,\(\)\*/?\"]*|[\d&\-!#\\:,\(\)\*/?\"]*$")
+stop_words = frozenset(["", "and", "or", "the", "a", "in"])
+# words ending like this are not plurals (glass, hummus, couscous)
+not_plural_endings = ("ss", "us")
+# singular words ending in "s" after an "i". plurals like kiwis and chilis
+# are stemmed like any other
+not_plural_words = frozenset(
+    ["anis", "basis", "chablis", "iris", "oasis", "paris", "pastis", "tunis"]
+)
+
+
+def stem(word):
+    """
+    reduce a plural to its singular form, "-ie" to "-y" and "-che" to "-ch",
+    so singular and plural both map to one term (peach and peaches, brioche
+    and brioches). applying it twice changes nothing
+    """
+    if len(word) <= 3 or word.endswith(not_plural_endings):
+        return word
+    if word in not_plural_words:
+        return word
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("sses", "shes", "xes", "oes")):
+        return word[:-2]
+    if word.endswith("s"):
+        word = word[:-1]
+    if word.endswith("che"):
+        return word[:-1]
+    if word.endswith("ie") and len(word) > 4:
+        return word[:-2] + "y"
+    return word
+
+
+def clean_keyword(word):
+    """
+    returns the index term for one word, or "" if the word is never indexed
+    """
+    keyword = keyword_trim.sub("", word.lower())
+    if keyword in stop_words:
+        return ""
+    return stem(keyword)
+
+
+def split_keywords(title):
+    """
+    split a title into cleaned, stemmed, unique keywords
+    """
+    keywords = []
+    for word in keyword_separator.split(title.lower()):
+        keyword = clean_keyword(word)
+        if keyword and keyword not in keywords:
+            keywords.append(keyword)
+    return keywords
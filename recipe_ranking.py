@@ -0,0 +1,135 @@
+"""
+Scoring for recipe search results.
+
+Candidates are scored from their keyword posting alone (title, ingredient count
+and directions length are precomputed at ingest), so only the best k full
+recipes are ever fetched. Title matches are weighted BM25 style: rare query
+terms count more than common ones, and a match in a short title counts more
+than the same match in a long one.
+"""
+import heapq
+import math
+import random
+
+from recipe_keywords import split_keywords
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+DEFAULT_AVERAGE_TITLE_TERMS = 3.0
+
+# recipes close to a typical ingredient count score best
+INGREDIENTS_TARGET = 8
+# directions this long are complete, longer ones do not score higher
+DIRECTIONS_TARGET = 1000
+# used for postings written before these features existed
+UNKNOWN_FEATURE_SCORE = 0.5
+
+WEIGHTS = {"title": 1.0, "ingredients": 0.25, "directions": 0.25}
+
+
+def ingredient_count(recipe):
+    return len(recipe.get("ingredients") or [])
+
+
+def directions_length(recipe):
+    return sum(len(step) for step in recipe.get("directions") or [])
+
+
+def bm25_idf(document_frequency, document_count):
+    return math.log(
+        1 + (document_count - document_frequency + 0.5) / (document_frequency + 0.5)
+    )
+
+
+def title_score(query_terms, title_terms, idf, average_terms):
+    """
+    BM25 over title keywords. a keyword appears at most once per title
+    """
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * len(title_terms) / average_terms)
+    matched = set(title_terms)
+    return sum(
+        idf.get(term, 1.0) * (BM25_K1 + 1) / (1 + norm)
+        for term in query_terms
+        if term in matched
+    )
+
+
+def ingredients_score(count):
+    if count is None:
+        return UNKNOWN_FEATURE_SCORE
+    return 1 / (1 + abs(float(count) - INGREDIENTS_TARGET) / INGREDIENTS_TARGET)
+
+
+def directions_score(length):
+    if length is None:
+        return UNKNOWN_FEATURE_SCORE
+    return min(float(length), DIRECTIONS_TARGET) / DIRECTIONS_TARGET
+
+
+class Scorer:
+    """
+    scores postings for one query. idf maps terms to weights, terms without
+    one (or no idf at all) weigh 1.0
+    """
+
+    def __init__(self, query_terms, idf=None, average_terms=None):
+        self.query_terms = list(query_terms)
+        self.idf = idf or {}
+        self.average_terms = average_terms or DEFAULT_AVERAGE_TITLE_TERMS
+
+    def score(self, posting):
+        return (
+            WEIGHTS["title"]
+            * title_score(
+                self.query_terms,
+                split_keywords(posting["title"]),
+                self.idf,
+                self.average_terms,
+            )
+            + WEIGHTS["ingredients"] * ingredients_score(posting.get("n_ingredients"))
+            + WEIGHTS["directions"]
+            * directions_score(posting.get("directions_length"))
+        )
+
+
+class TopK:
+    """
+    the k best scored items seen so far, kept in a min heap so memory stays
+    bounded however many candidates stream through
+    """
+
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+        self.seen = 0
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, score, item):
+        self.seen += 1
+        # earlier candidates win ties, and items are never compared
+        entry = (score, -self.seen, item)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry > self.heap[0]:
+            heapq.heapreplace(self.heap, entry)
+
+    def ranked(self):
+        """
+        (score, item) pairs, best first
+        """
+        return [(score, item) for score, _, item in sorted(self.heap, reverse=True)]
+
+
+def sample(ranked, temperature, rng=random):
+    """
+    pick one (score, item) pair from a ranked list, softmax weighted by score
+    so better matches are more likely but repeated questions get some variety.
+    temperature 0 always picks the best
+    """
+    if temperature <= 0 or len(ranked) == 1:
+        return ranked[0]
+    best = ranked[0][0]
+    weights = [math.exp((score - best) / temperature) for score, _ in ranked]
+    return rng.choices(ranked, weights)[0]
@@ -0,0 +1,71 @@
+"""
+Recipe messages for the chatbot, rendered once at ingest.
+
+A recipe is stored as a list of plain text messages, each short enough for one
+Lex message. The chatbot sends a page of MESSAGES_PER_PAGE messages per turn
+and keeps the rest for the ContinueRecipe intent, so a long recipe never makes
+one oversized response and fulfillment only slices a stored list.
+"""
+
+# longest content Lex accepts for one plain text message
+MAX_MESSAGE_CHARS = 1000
+MESSAGES_PER_PAGE = 3
+CONTINUE_PROMPT = 'Say "continue" for the rest of the recipe.'
+
+
+def recipe_text(recipe):
+    title = recipe["title"]
+    ingredients = "\n".join(recipe.get("ingredients") or [])
+    directions = "\n".join(recipe.get("directions") or [])
+    source = recipe.get("link")
+    return (
+        f"Here's the recipe for {title}:\n\nIngredients:\n{ingredients}\n\n"
+        f"Directions:\n{directions}\n\nSource: {source}"
+    )
+
+
+def split_line(line, max_chars):
+    """
+    cut a line longer than max_chars at spaces, or anywhere if a word is longer
+    """
+    pieces = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(line[:cut].rstrip())
+        line = line[cut:].lstrip()
+    pieces.append(line)
+    return pieces
+
+
+def render_messages(recipe, max_chars=MAX_MESSAGE_CHARS):
+    """
+    the recipe text split at line breaks into messages of at most max_chars.
+    a short recipe is a single message
+    """
+    messages = []
+    current = ""
+    for line in recipe_text(recipe).split("\n"):
+        for piece in split_line(line, max_chars):
+            if current and len(current) + 1 + len(piece) > max_chars:
+                messages.append(current.strip("\n"))
+                current = piece
+            else:
+                current = f"{current}\n{piece}" if current else piece
+    if current.strip("\n"):
+        messages.append(current.strip("\n"))
+    return messages
+
+
+def page(messages, number, per_page=MESSAGES_PER_PAGE):
+    """
+    the messages of page number (from 0) and whether more pages follow. a page
+    that is not the last ends with CONTINUE_PROMPT
+    """
+    start = number * per_page
+    selected = list(messages[start : start + per_page])
+    more = start + per_page < len(messages)
+    if more:
+        selected.append(CONTINUE_PROMPT)
+    return selected, more
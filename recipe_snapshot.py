@@ -0,0 +1,287 @@
+"""
+Columnar snapshot of the parsed recipe corpus.
+
+A snapshot holds every recipe as importcsv.py stores it in DynamoDB, plus the
+title keyword postings, in one memory-mappable file. Opening it only maps the
+file, so a multi-GB corpus opens instantly and a lookup reads just the pages
+(and compressed blocks) it touches.
+
+Sections use the layout of recipe_index.py:
+    meta                    json: count, block_size, compression
+    <column>.offsets        uint64, n + 1 offsets into the uncompressed heap
+    <column>.heap           utf-8 strings, or zlib blocks when compressed
+    <column>.blocks         uint64 offsets of the zlib blocks in the heap
+    Id.sorted               uint32 recipe ordinals sorted by Id
+    <number column>         uint32 per recipe
+    terms, postings         title keyword postings, like recipe_index.py
+
+A compressed block covers block_size consecutive recipes of one column. The
+Id column is never compressed so Ids can be binary searched in place. List
+columns store every item behind a \\x1f separator.
+"""
+import json
+import tempfile
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+import recipe_index
+from recipe_keywords import split_keywords
+
+MAGIC = b"RBSN"
+VERSION = 3
+
+STRING_COLUMNS = ("Id", "title", "link", "source")
+LIST_COLUMNS = ("ingredients", "directions", "NER", "rendered")
+NUMBER_COLUMNS = ("diet_mask", "n_ingredients", "directions_length")
+LIST_SEPARATOR = "\x1f"
+
+DEFAULT_BLOCK_SIZE = 1024
+COMPRESSION_LEVEL = 6
+CACHED_BLOCKS = 4
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def is_snapshot(path):
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def encode_list(items):
+    text = "".join(LIST_SEPARATOR + item for item in items or [])
+    if text.count(LIST_SEPARATOR) != len(items or []):
+        raise ValueError(f"list item contains the separator: {items!r}")
+    return text
+
+
+def decode_list(text):
+    return text.split(LIST_SEPARATOR)[1:]
+
+
+def _read_chunks(f):
+    f.seek(0)
+    while True:
+        chunk = f.read(COPY_CHUNK_SIZE)
+        if not chunk:
+            return
+        yield chunk
+
+
+class _ColumnWriter:
+    """
+    appends one string per recipe to a temporary heap, compressing every
+    block_size recipes into one zlib block
+    """
+
+    def __init__(self, compress, block_size):
+        self.compress = compress
+        self.block_size = block_size
+        self.heap = tempfile.TemporaryFile()
+        self.offsets = array("Q", [0])
+        self.blocks = array("Q", [0])
+        self.pending = bytearray()
+
+    def append(self, text):
+        data = (text or "").encode("utf-8")
+        self.offsets.append(self.offsets[-1] + len(data))
+        if not self.compress:
+            self.heap.write(data)
+            return
+        self.pending += data
+        if (len(self.offsets) - 1) % self.block_size == 0:
+            self.flush_block()
+
+    def flush_block(self):
+        self.heap.write(zlib.compress(bytes(self.pending), COMPRESSION_LEVEL))
+        self.blocks.append(self.heap.tell())
+        self.pending = bytearray()
+
+    def sections(self, name):
+        if self.compress and (len(self.offsets) - 1) % self.block_size:
+            self.flush_block()
+        sections = [
+            (f"{name}.offsets", recipe_index.little_endian(self.offsets).tobytes()),
+            (f"{name}.heap", _read_chunks(self.heap)),
+        ]
+        if self.compress:
+            blocks = recipe_index.little_endian(self.blocks).tobytes()
+            sections.append((f"{name}.blocks", blocks))
+        return sections
+
+
+def write_snapshot(path, recipes, compress=True, block_size=DEFAULT_BLOCK_SIZE):
+    """
+    recipes yields items shaped like the ones importcsv.py writes. text columns
+    are streamed through temporary files, only offsets, Ids and postings are
+    kept in memory
+    """
+    columns = {
+        name: _ColumnWriter(compress and name != "Id", block_size)
+        for name in STRING_COLUMNS + LIST_COLUMNS
+    }
+    numbers = {name: array("I") for name in NUMBER_COLUMNS}
+    ids = []
+    postings = {}
+    for ordinal, recipe in enumerate(recipes):
+        ids.append(recipe["Id"])
+        for name in STRING_COLUMNS:
+            columns[name].append(recipe.get(name))
+        for name in LIST_COLUMNS:
+            columns[name].append(encode_list(recipe.get(name)))
+        for name in NUMBER_COLUMNS:
+            numbers[name].append(int(recipe.get(name) or 0))
+        for keyword in split_keywords(recipe.get("title") or ""):
+            postings.setdefault(keyword, array("I")).append(ordinal)
+
+    meta = {
+        "count": len(ids),
+        "block_size": block_size,
+        "compression": "zlib" if compress else None,
+    }
+    sections = [("meta", json.dumps(meta).encode("utf-8"))]
+    for name, column in columns.items():
+        sections += column.sections(name)
+    by_id = array("I", sorted(range(len(ids)), key=lambda o: ids[o].encode("utf-8")))
+    sections.append(("Id.sorted", recipe_index.little_endian(by_id).tobytes()))
+    for name in NUMBER_COLUMNS:
+        sections.append((name, recipe_index.little_endian(numbers[name]).tobytes()))
+
+    terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+    offsets, heap = recipe_index.string_table(terms)
+    posting_offsets = array("Q", [0])
+    all_postings = array("I")
+    for term in terms:
+        all_postings.extend(postings[term])
+        posting_offsets.append(len(all_postings))
+    sections += [
+        ("terms.offsets", offsets),
+        ("terms.heap", heap),
+        ("postings.offsets", recipe_index.little_endian(posting_offsets).tobytes()),
+        ("postings", recipe_index.little_endian(all_postings).tobytes()),
+    ]
+
+    try:
+        recipe_index.write_sections(path, MAGIC, VERSION, sections)
+    finally:
+        for column in columns.values():
+            column.heap.close()
+    return len(ids)
+
+
+class _StringColumn:
+    def __init__(self, sections, name, block_size):
+        self.offsets = sections[f"{name}.offsets"].cast("Q")
+        self.heap = sections[f"{name}.heap"]
+        blocks = sections.get(f"{name}.blocks")
+        self.blocks = blocks.cast("Q") if blocks is not None else None
+        self.block_size = block_size
+        self.cache = OrderedDict()
+
+    def block(self, number):
+        data = self.cache.get(number)
+        if data is None:
+            start, end = self.blocks[number], self.blocks[number + 1]
+            data = zlib.decompress(self.heap[start:end])
+            self.cache[number] = data
+            if len(self.cache) > CACHED_BLOCKS:
+                self.cache.popitem(last=False)
+        else:
+            self.cache.move_to_end(number)
+        return data
+
+    def raw(self, ordinal):
+        start, end = self.offsets[ordinal], self.offsets[ordinal + 1]
+        if self.blocks is None:
+            return bytes(self.heap[start:end])
+        number = ordinal // self.block_size
+        base = self.offsets[number * self.block_size]
+        return self.block(number)[start - base : end - base]
+
+    def __getitem__(self, ordinal):
+        return self.raw(ordinal).decode("utf-8")
+
+
+class _SortedIds:
+    # lets bisect search the Ids through the Id.sorted permutation
+    def __init__(self, ids, order):
+        self.ids = ids
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, i):
+        return self.ids.raw(self.order[i])
+
+
+class RecipeSnapshot:
+    def __init__(self, path):
+        self.path = path
+        self.mapped, sections = recipe_index.read_sections(path, MAGIC, VERSION)
+        self.meta = json.loads(bytes(sections["meta"]))
+        block_size = self.meta["block_size"]
+        self.columns = {
+            name: _StringColumn(sections, name, block_size)
+            for name in STRING_COLUMNS + LIST_COLUMNS
+        }
+        self.numbers = {name: sections[name].cast("I") for name in NUMBER_COLUMNS}
+        self.by_id = sections["Id.sorted"].cast("I")
+        self.terms = recipe_index.StringTable(
+            sections["terms.offsets"], sections["terms.heap"]
+        )
+        self.posting_offsets = sections["postings.offsets"].cast("Q")
+        self.postings_data = sections["postings"].cast("I")
+
+    def __len__(self):
+        return self.meta["count"]
+
+    def recipe_id(self, ordinal):
+        return self.columns["Id"][ordinal]
+
+    def find(self, recipe_id):
+        """
+        the ordinal of a recipe Id, or None
+        """
+        key = recipe_id.encode("utf-8")
+        ids = _SortedIds(self.columns["Id"], self.by_id)
+        i = bisect_left(ids, key)
+        if i < len(ids) and ids[i] == key:
+            return self.by_id[i]
+        return None
+
+    def field(self, ordinal, name):
+        if name in NUMBER_COLUMNS:
+            return self.numbers[name][ordinal]
+        value = self.columns[name][ordinal]
+        return decode_list(value) if name in LIST_COLUMNS else value
+
+    def recipe(self, ordinal):
+        """
+        one recipe as a dict shaped like the DynamoDB item
+        """
+        return {
+            name: self.field(ordinal, name)
+            for name in STRING_COLUMNS + LIST_COLUMNS + NUMBER_COLUMNS
+        }
+
+    def iter_recipes(self):
+        """
+        every recipe in file order, each compressed block is inflated once
+        """
+        for ordinal in range(len(self)):
+            yield self.recipe(ordinal)
+
+    def postings(self, keyword):
+        """
+        sorted ordinals of the recipes with keyword in the title, zero copy
+        """
+        i = self.terms.find(keyword)
+        if i is None:
+            return self.postings_data[0:0]
+        return self.postings_data[self.posting_offsets[i] : self.posting_offsets[i + 1]]
+
+    def close(self):
+        self.columns, self.numbers, self.terms = {}, {}, None
+        self.by_id = self.posting_offsets = self.postings_data = None
+        self.mapped.close()
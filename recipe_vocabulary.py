@@ -0,0 +1,143 @@
+"""
+Spelling index over the title keywords, so user input can be mapped to a key
+that exists in the keyword table before any query is sent.
+
+Symmetric delete: every term is stored under the hashes of itself and of each
+string left after deleting one of its characters. A lookup hashes the same
+deletes of the input, so words within one edit of each other (insertion,
+deletion, substitution or swap of neighbours) meet on a shared delete and are
+found with a few binary searches instead of a scan of the vocabulary.
+Candidates are confirmed with the real edit distance.
+
+Built offline by lambda_update_dynamodb/buildVocabulary.py, using the section
+layout of recipe_index.py:
+    terms.offsets/heap  sorted string table of the stemmed keywords
+    counts              uint32 number of recipe titles per term
+    deletes.hashes      sorted uint64 hashes of the deletes
+    deletes.terms       uint32 term number for each hash
+"""
+import hashlib
+from array import array
+from bisect import bisect_left, bisect_right
+
+import recipe_index
+
+MAGIC = b"RBVC"
+VERSION = 2
+# the index only holds single deletes, so it finds words one edit apart
+MAX_EDIT_DISTANCE = 1
+# shorter words are too ambiguous to correct
+MIN_CORRECTION_LENGTH = 4
+
+
+def delete_hash(text):
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def deletes(term):
+    """
+    the term and every string with one character removed
+    """
+    return {term} | {term[:i] + term[i + 1 :] for i in range(len(term))}
+
+
+def edit_distance(a, b, limit):
+    """
+    optimal string alignment distance, or limit + 1 once it is known to be larger
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = None
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, row = previous, row, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > limit:
+            return limit + 1
+    return row[-1]
+
+
+def write_vocabulary(path, counts, min_count=1):
+    """
+    counts maps each keyword to the number of titles it appears in. terms seen
+    fewer than min_count times are left out
+    """
+    terms = sorted(
+        (term for term, count in counts.items() if term and count >= min_count),
+        key=lambda t: t.encode("utf-8"),
+    )
+    pairs = sorted(
+        (delete_hash(d), number)
+        for number, term in enumerate(terms)
+        for d in deletes(term)
+    )
+    column = array("I", (counts[term] for term in terms))
+    hashes = array("Q", (key for key, _ in pairs))
+    owners = array("I", (number for _, number in pairs))
+    offsets, heap = recipe_index.string_table(terms)
+    sections = [
+        ("terms.offsets", offsets),
+        ("terms.heap", heap),
+        ("counts", recipe_index.little_endian(column).tobytes()),
+        ("deletes.hashes", recipe_index.little_endian(hashes).tobytes()),
+        ("deletes.terms", recipe_index.little_endian(owners).tobytes()),
+    ]
+    recipe_index.write_sections(path, MAGIC, VERSION, sections)
+    return len(terms)
+
+
+class Vocabulary:
+    def __init__(self, path):
+        self.path = path
+        self.mapped, sections = recipe_index.read_sections(path, MAGIC, VERSION)
+        self.terms = recipe_index.StringTable(
+            sections["terms.offsets"], sections["terms.heap"]
+        )
+        self.counts = sections["counts"].cast("I")
+        self.hashes = sections["deletes.hashes"].cast("Q")
+        self.owners = sections["deletes.terms"].cast("I")
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __contains__(self, term):
+        return self.terms.find(term) is not None
+
+    def candidates(self, term):
+        """
+        numbers of the terms that share a delete with term
+        """
+        found = set()
+        for text in deletes(term):
+            key = delete_hash(text)
+            low = bisect_left(self.hashes, key)
+            high = bisect_right(self.hashes, key, low)
+            found.update(self.owners[low:high])
+        return found
+
+    def correct(self, term):
+        """
+        term itself when it is indexed, otherwise the closest indexed term
+        (most common on a tie), or None
+        """
+        if term in self:
+            return term
+        if len(term) < MIN_CORRECTION_LENGTH:
+            return None
+        best = None
+        for number in self.candidates(term):
+            candidate = self.terms[number]
+            distance = edit_distance(term, candidate, MAX_EDIT_DISTANCE)
+            if distance <= MAX_EDIT_DISTANCE:
+                key = (distance, -self.counts[number], candidate)
+                best = key if best is None else min(best, key)
+        return best[2] if best else None
+
+    def close(self):
+        self.terms = self.counts = self.hashes = self.owners = None
+        self.mapped.close()
@@ -0,0 +1,124 @@
+"""
+Per request stage timers and counters for the chatbot lambda.
+
+Each invocation collects stage timings (ms) and counters in a RequestMetrics
+object and flushes them once at the end as a single CloudWatch embedded metric
+format (EMF) record, so CloudWatch turns the log line into metrics without any
+extra API calls. The sink is pluggable for tests and benchmarks.
+
+METRICS_NAMESPACE   CloudWatch namespace, RecipeBot by default
+METRICS_ENABLED     set to "false" to turn collection off
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "RecipeBot")
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "true").lower() != "false"
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.timings = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - started) * 1000)
+
+    def record(self, name, elapsed_ms):
+        """
+        add a duration measured elsewhere, for example on a worker thread
+        """
+        self.timings[name] = self.timings.get(name, 0.0) + elapsed_ms
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def emf_record(self, dimensions):
+        metrics = [
+            {"Name": f"{name}_ms", "Unit": "Milliseconds"} for name in self.timings
+        ]
+        metrics += [{"Name": name, "Unit": "Count"} for name in self.counters]
+        record = {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": METRICS_NAMESPACE,
+                        "Dimensions": [sorted(dimensions)],
+                        "Metrics": metrics,
+                    }
+                ],
+            },
+            **dimensions,
+        }
+        record.update((f"{n}_ms", round(v, 3)) for n, v in self.timings.items())
+        record.update(self.counters)
+        return record
+
+
+class DisabledMetrics(RequestMetrics):
+    """
+    what a request collects with METRICS_ENABLED=false: stages still run but
+    nothing is timed or counted
+    """
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def record(self, name, elapsed_ms):
+        pass
+
+    def count(self, name, value=1):
+        pass
+
+
+def print_sink(record):
+    # lambda sends stdout to CloudWatch Logs, which extracts the EMF metrics
+    print(json.dumps(record, separators=(",", ":")))
+
+
+_sink = print_sink
+_current = RequestMetrics()
+
+
+def set_sink(sink):
+    """
+    replace where flushed records go, sink(record) gets the EMF dict
+    """
+    global _sink
+    _sink = sink
+
+
+def start_request():
+    global _current
+    _current = RequestMetrics() if METRICS_ENABLED else DisabledMetrics()
+    return _current
+
+
+def current():
+    return _current
+
+
+def stage(name):
+    return _current.stage(name)
+
+
+def record(name, elapsed_ms):
+    _current.record(name, elapsed_ms)
+
+
+def count(name, value=1):
+    _current.count(name, value)
+
+
+def flush(**dimensions):
+    if METRICS_ENABLED and (_current.timings or _current.counters):
+        _sink(_current.emf_record(dimensions))
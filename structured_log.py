@@ -0,0 +1,50 @@
+"""
+Compact, structured logging for the chatbot lambda.
+
+Every record is one JSON line with an event name plus small fields such as ids,
+counts and timings. Full payloads (events, recipes) are only logged at DEBUG and
+only for a sampled fraction of requests. They are passed in as callables, so
+nothing is serialized when they are not going to be logged.
+
+LOG_LEVEL                 logging level, INFO by default
+LOG_PAYLOAD_SAMPLE_RATE   fraction of requests whose payloads are logged at DEBUG
+"""
+import json
+import logging
+import os
+import random
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+PAYLOAD_SAMPLE_RATE = float(os.environ.get("LOG_PAYLOAD_SAMPLE_RATE", "0.01"))
+
+logger = logging.getLogger()
+logger.setLevel(LOG_LEVEL)
+
+_request_fields = {}
+_sample_payloads = False
+
+
+def start_request(**fields):
+    """
+    set the fields added to every record of this invocation and decide
+    whether its payloads are sampled
+    """
+    global _sample_payloads
+    _request_fields.clear()
+    _request_fields.update((k, v) for k, v in fields.items() if v is not None)
+    _sample_payloads = random.random() < PAYLOAD_SAMPLE_RATE
+
+
+def log_event(event, level=logging.INFO, **fields):
+    if logger.isEnabledFor(level):
+        record = {"event": event, **_request_fields, **fields}
+        logger.log(level, json.dumps(record, default=str, separators=(",", ":")))
+
+
+def log_payload(event, build_payload):
+    """
+    log build_payload() at DEBUG for sampled requests, build_payload is never
+    called otherwise
+    """
+    if _sample_payloads and logger.isEnabledFor(logging.DEBUG):
+        log_event(event, logging.DEBUG, payload=build_payload())
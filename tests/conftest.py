@@ -0,0 +1,36 @@
+import csv
+import os
+import sys
+
+import pytest
+
+# the shared modules live at the repository root and the ingest scripts and
+# benchmark helpers next to them, none of them are installed as a package
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in ("", "lambda_update_dynamodb", "benchmarks"):
+    sys.path.insert(0, os.path.join(ROOT, path))
+
+CSV_HEADER = ["", "title", "ingredients", "directions", "link", "source", "NER"]
+
+
+@pytest.fixture
+def write_corpus(tmp_path):
+    """
+    write a small RecipeNLG style csv with one recipe per title, returns its
+    path. ingredients are given as (ingredient, NER) pairs
+    """
+
+    def write(titles, ingredients=(("1 c. flour", "flour"),), name="recipes.csv"):
+        path = tmp_path / name
+        lines = '["' + '", "'.join(line for line, _ in ingredients) + '"]'
+        ner = '["' + '", "'.join(entity for _, entity in ingredients) + '"]'
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADER)
+            for n, title in enumerate(titles):
+                writer.writerow(
+                    [n, title, lines, '["Bake."]', f"x/{n}", "Gathered", ner]
+                )
+        return str(path)
+
+    return write
@@ -0,0 +1,79 @@
+import pytest
+
+import dietary_rules
+
+
+def satisfied(ner):
+    return set(dietary_rules.diet_names(dietary_rules.diet_mask(ner)))
+
+
+def test_recipe_without_ingredients_satisfies_every_restriction():
+    assert satisfied([]) == set(dietary_rules.RESTRICTIONS)
+    assert satisfied(None) == set(dietary_rules.RESTRICTIONS)
+
+
+@pytest.mark.parametrize(
+    "ingredient, broken",
+    [
+        # a missing comma used to join them into one "brown sugarhoney"
+        ("brown sugar", {"sugar free"}),
+        ("honey", {"vegan", "sugar free"}),
+        # was misspelled "maple syurp"
+        ("maple syrup", {"sugar free"}),
+        # matching ignores case and extra spaces
+        ("Brazil  Nuts", {"nuts free"}),
+        ("Casein", {"dairy free"}),
+        ("ice cream", {"vegan", "sugar free", "dairy free"}),
+        ("flour", set()),
+    ],
+)
+def test_diet_mask(ingredient, broken):
+    assert satisfied(["flour", ingredient]) == set(dietary_rules.RESTRICTIONS) - broken
+
+
+def test_matching_is_by_whole_ingredient():
+    # "butter" is banned for dairy free, "peanut butter" is not
+    assert "dairy free" in satisfied(["peanut butter"])
+    assert "dairy free" not in satisfied(["butter"])
+
+
+def test_diet_bits_keep_their_order():
+    # masks are stored with the recipes, so existing bits never move
+    assert dietary_rules.DIET_BITS["gluten free"] == 1
+    assert dietary_rules.DIET_BITS["halal"] == 1 << 7
+
+
+def test_restriction_mask():
+    vegan = dietary_rules.DIET_BITS["vegan"]
+    gluten_free = dietary_rules.DIET_BITS["gluten free"]
+    assert dietary_rules.restriction_mask(()) == 0
+    assert dietary_rules.restriction_mask(("vegan", "gluten free")) == (
+        vegan | gluten_free
+    )
+    assert dietary_rules.restriction_mask(("vegan", "paleo")) == vegan
+    mask = dietary_rules.restriction_mask(("vegan", "gluten free"))
+    assert dietary_rules.diet_names(mask) == ["gluten free", "vegan"]
+
+
+def test_parse_restrictions():
+    parse = dietary_rules.parse_restrictions
+    assert parse("Vegan and  Gluten Free") == ("vegan", "gluten free")
+    assert parse("vegan, dairy free & vegan") == ("vegan", "dairy free")
+    assert parse("none") == parse("") == parse(None) == ()
+    assert dietary_rules.unknown_restrictions(parse("vegan and paleo")) == ["paleo"]
+
+
+@pytest.mark.parametrize(
+    "names, diet",
+    [
+        ([], None),
+        (["gluten free"], None),
+        (["gluten free", "nuts free", "halal", "kosher"], None),
+        (["gluten free", "sugar free"], "sugar free"),
+        (["sugar free", "dairy free"], "dairy free"),
+        (["dairy free", "vegan", "vegetarian"], "vegan"),
+    ],
+)
+def test_partition_diet(names, diet):
+    assert dietary_rules.partition_diet(names) == diet
+    assert diet is None or diet in dietary_rules.PARTITIONED_DIETS
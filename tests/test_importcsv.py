@@ -0,0 +1,118 @@
+import threading
+
+import pytest
+
+ROWS = 60
+
+
+class FakeRecipeTable:
+    """
+    the batch calls of a DynamoDB resource over one in-memory table, shared
+    by the shard threads. the write call numbered fail_on raises
+    """
+
+    def __init__(self, items=None, fail_on=None):
+        self.items = dict(items or {})
+        self.fail_on = fail_on
+        self.write_calls = 0
+        self.puts = 0
+        self.lock = threading.Lock()
+
+    def batch_write_item(self, RequestItems):
+        import importcsv
+
+        with self.lock:
+            self.write_calls += 1
+            if self.write_calls == self.fail_on:
+                raise RuntimeError("recipe table unavailable")
+            for request in RequestItems[importcsv.table_name]:
+                item = request["PutRequest"]["Item"]
+                self.items[item["Id"]] = item
+                self.puts += 1
+        return {"UnprocessedItems": {}}
+
+    def batch_get_item(self, RequestItems):
+        import importcsv
+
+        keys = RequestItems[importcsv.table_name]["Keys"]
+        with self.lock:
+            found = [self.items[k["Id"]] for k in keys if k["Id"] in self.items]
+        return {"Responses": {importcsv.table_name: found}, "UnprocessedKeys": {}}
+
+
+@pytest.fixture
+def corpus(write_corpus):
+    return write_corpus([f"Recipe, \"Number\" {n}" for n in range(ROWS)])
+
+
+def run_import(monkeypatch, table, path, checkpoints, shards, upsert=False):
+    import dynamoUtils
+    import importcsv
+
+    monkeypatch.setattr(dynamoUtils, "thread_resource", lambda: table)
+    return importcsv.sharded_import(
+        {"path": path}, str(checkpoints), shard_count=shards, workers=4, upsert=upsert
+    )
+
+
+def expected_items(path):
+    import importcsv
+
+    with importcsv.open_recipes(path) as recipes:
+        return {recipe["Id"]: recipe for recipe in recipes}
+
+
+@pytest.mark.parametrize("shards", [1, 2, 3, 7, 64, 2000])
+def test_every_shard_count_imports_the_same_rows(
+    monkeypatch, corpus, tmp_path, shards
+):
+    table = FakeRecipeTable()
+    assert run_import(monkeypatch, table, corpus, tmp_path / "ck", shards) == ROWS
+    assert table.items == expected_items(corpus)
+    assert table.puts == ROWS
+
+
+def test_a_stopped_import_resumes_from_its_checkpoints(monkeypatch, corpus, tmp_path):
+    table = FakeRecipeTable(fail_on=2)
+    with pytest.raises(RuntimeError):
+        run_import(monkeypatch, table, corpus, tmp_path / "ck", 1)
+    # the first batch of 25 rows was written and checkpointed
+    assert table.puts == 25
+
+    table.fail_on = None
+    assert run_import(monkeypatch, table, corpus, tmp_path / "ck", 1) == ROWS
+    assert table.items == expected_items(corpus)
+    assert table.puts == ROWS
+
+    # a finished import does nothing when it is run again
+    assert run_import(monkeypatch, table, corpus, tmp_path / "ck", 1) == ROWS
+    assert table.puts == ROWS
+
+
+def test_upsert_writes_only_new_and_changed_rows(monkeypatch, corpus, tmp_path):
+    table = FakeRecipeTable(expected_items(corpus))
+    run_import(monkeypatch, table, corpus, tmp_path / "ck1", 4, upsert=True)
+    assert table.puts == 0
+
+    # one row gets longer directions, one is new
+    changed = tmp_path / "changed.csv"
+    with open(corpus, encoding="utf-8") as f:
+        lines = f.read().splitlines(keepends=True)
+    lines[6] = lines[6].replace("Bake.", "Bake until golden.")
+    lines.append(lines[-1].replace(f"Number\"\" {ROWS - 1}", "Number\"\" new"))
+    changed.write_text("".join(lines), encoding="utf-8")
+
+    run_import(monkeypatch, table, str(changed), tmp_path / "ck2", 4, upsert=True)
+    assert table.puts == 2
+    assert table.items == expected_items(str(changed))
+
+
+def test_a_quoted_line_break_stops_the_sharded_import(
+    monkeypatch, write_corpus, tmp_path
+):
+    path = write_corpus(["Plain Cake", "Two\nLine Cake", "Plain Pie"])
+    table = FakeRecipeTable()
+    with pytest.raises(ValueError, match="one csv row"):
+        run_import(monkeypatch, table, path, tmp_path / "ck", 1)
+    with pytest.raises(ValueError, match="one csv row"):
+        run_import(monkeypatch, table, path, tmp_path / "ck3", 3)
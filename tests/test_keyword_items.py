@@ -0,0 +1,41 @@
+def recipe(ner):
+    return {
+        "Id": "r1",
+        "title": "Chocolate Cookies",
+        "ingredients": ["1 c. flour"],
+        "directions": ["Bake."],
+        "NER": ner,
+    }
+
+
+def partitions(item):
+    import createKeywords
+
+    return sorted(posting["keywords"] for posting in createKeywords.keyword_items(item))
+
+
+def test_only_selective_restrictions_get_partitions():
+    # flour and cocoa satisfy every restriction
+    assert partitions(recipe(["flour", "cocoa"])) == [
+        "chocolate",
+        "chocolate#dairy free",
+        "chocolate#sugar free",
+        "chocolate#vegan",
+        "cooky",
+        "cooky#dairy free",
+        "cooky#sugar free",
+        "cooky#vegan",
+    ]
+
+
+def test_recipe_without_selective_restrictions_has_one_posting_per_keyword():
+    import createKeywords
+
+    postings = createKeywords.keyword_items(recipe(["eggs", "butter", "sugar"]))
+    assert sorted(posting["keywords"] for posting in postings) == [
+        "chocolate",
+        "cooky",
+    ]
+    # the other restrictions are still filtered on
+    assert "gluten free" in postings[0]["diets"]
+    assert "vegan" not in postings[0]["diets"]
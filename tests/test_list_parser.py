@@ -0,0 +1,38 @@
+import ast
+
+import pytest
+
+import listParser
+
+FIELDS = [
+    '["1 c. flour, sifted", "2 eggs"]',
+    '["Bake at 350\\u00b0.", "Say \\"cheese\\"."]',
+    "['single', 'quoted']",
+    '["trailing", "comma",]',
+    ' ["padded"] ',
+    "[]",
+]
+
+
+@pytest.mark.parametrize("value", FIELDS)
+def test_parse_list_matches_literal_eval(value):
+    assert listParser.parse_list(value) == ast.literal_eval(value.strip())
+
+
+def test_parse_lists_matches_parse_list():
+    assert listParser.parse_lists(FIELDS) == [
+        listParser.parse_list(value) for value in FIELDS
+    ]
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        ['["a"], ["b"', '"c"]'],
+        ['["x", "]', '[", "z"]', '["p"], ["o"]'],
+    ],
+)
+def test_parse_lists_keeps_fields_apart(values):
+    # joined, these fields are valid json with the lists shifted across fields
+    parsed = listParser.parse_lists(values)
+    assert parsed == [listParser.parse_list(value) for value in values]
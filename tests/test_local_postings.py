@@ -0,0 +1,54 @@
+import pytest
+
+
+@pytest.fixture
+def handler(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("PREWARM_CONNECTIONS", "false")
+    import lambda_function_askforrecipe as handler
+
+    return handler
+
+
+def test_local_search_ranks_the_candidate_budget(
+    handler, write_corpus, tmp_path, monkeypatch
+):
+    import buildIndex
+    import recipe_index
+    import recipe_ranking
+
+    budget = handler.LOCAL_CANDIDATES
+    # a short title scores best, the best one within the budget is at 60 and
+    # better ones past the budget are not read
+    titles = [f"Chocolate Cookies With Walnuts {n}" for n in range(budget + 50)]
+    titles[60] = "Chocolate Cookies"
+    for n in range(budget, budget + 50):
+        titles[n] = "Chocolate Cookies"
+    path = str(tmp_path / "recipes.idx")
+    buildIndex.build_index(write_corpus(titles), path)
+    index = recipe_index.RecipeIndex(path)
+    monkeypatch.setattr(handler, "_recipe_index", index)
+
+    scorer = handler.make_scorer(["chocolate", "cooky"])
+    scored, passed, position = handler.local_postings(
+        "cooky", ["chocolate"], (), scorer, {}
+    )
+
+    assert len(scored) == budget
+    budget_ids = {index.recipe_id(ordinal) for ordinal in range(budget)}
+    assert passed == budget_ids
+    assert position == {"o": budget - 1}
+    top = recipe_ranking.TopK(10)
+    for score, posting in scored:
+        top.push(score, posting)
+    ranked = top.ranked()
+    assert ranked[0][1]["recipe_id"] == index.recipe_id(60)
+    scores = [score for score, _ in ranked]
+    assert scores == sorted(scores, reverse=True)
+
+    # a search for more reads on from the last ordinal read
+    scored, passed, position = handler.local_postings(
+        "cooky", ["chocolate"], (), scorer, position
+    )
+    assert len(scored) == 50
+    assert position is None
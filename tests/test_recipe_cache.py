@@ -0,0 +1,147 @@
+import multiprocessing
+import shutil
+
+import pytest
+
+import recipe_cache
+import recipe_index
+
+
+def open_elsewhere(path, results):
+    try:
+        recipe_cache.HotRecipeStore(path, 10000)
+        results.put("opened")
+    except BlockingIOError:
+        results.put("refused")
+
+
+def other_process_opens(path):
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=open_elsewhere, args=(path, results))
+    process.start()
+    process.join()
+    return results.get()
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    return str(tmp_path / "hot.bin")
+
+
+def test_values_survive_reopening(store_path):
+    store = recipe_cache.HotRecipeStore(store_path, 10000)
+    store.put("a", b"first")
+    store.put("b", b"second")
+    store.close()
+    # a torn last record is dropped
+    with open(store_path, "ab") as f:
+        f.write(b"\x05\x00\x00\x00\xff")
+    store = recipe_cache.HotRecipeStore(store_path, 10000)
+    assert store.get("a") == b"first"
+    assert store.get("b") == b"second"
+    store.put("c", b"third")
+    assert store.get("c") == b"third"
+
+
+def test_eviction_keeps_the_most_recently_used(store_path):
+    store = recipe_cache.HotRecipeStore(store_path, 4000)
+    for n in range(100):
+        store.put(f"r{n}", b"x" * 60)
+        store.get("r0")
+    assert store.stats()["bytes"] <= 4000
+    assert store.evictions > 0
+    assert store.get("r0") == b"x" * 60
+    assert store.get("r99") == b"x" * 60
+    assert "r50" not in store
+
+
+def test_discard_counts_a_miss(store_path):
+    store = recipe_cache.HotRecipeStore(store_path, 10000)
+    store.put("a", b"{broken")
+    assert store.get("a") == b"{broken"
+    store.discard("a")
+    assert "a" not in store
+    assert store.stats()["hits"] == 0
+    assert store.stats()["misses"] == 1
+
+
+def test_one_process_owns_the_store(store_path):
+    store = recipe_cache.HotRecipeStore(store_path, 4000)
+    assert other_process_opens(store_path) == "refused"
+    # compaction replaces the file, the lock stays
+    for n in range(100):
+        store.put(f"r{n}", b"x" * 60)
+    assert other_process_opens(store_path) == "refused"
+    store.close()
+    assert other_process_opens(store_path) == "opened"
+
+
+class FakeS3:
+    def __init__(self, source, etag):
+        self.source = source
+        self.etag = etag
+        self.downloads = 0
+        self.down = False
+
+    def head_object(self, Bucket, Key):
+        if self.down:
+            raise ConnectionError("S3 is down")
+        return {"ETag": self.etag}
+
+    def download_file(self, bucket, key, path):
+        self.downloads += 1
+        shutil.copy(self.source, path)
+
+
+def test_cached_file_downloads_only_when_the_object_changes(tmp_path):
+    source = str(tmp_path / "built.idx")
+    recipe_index.write_index(source, [])
+    s3 = FakeS3(source, '"1"')
+    directory = str(tmp_path / "cache")
+    url = "s3://bucket/data/recipes.idx"
+    stamp = (recipe_index.MAGIC, recipe_index.VERSION)
+
+    assert recipe_cache.cached_file(s3, url, directory, *stamp)[1] == "downloaded"
+    assert recipe_cache.cached_file(s3, url, directory, *stamp)[1] == "cached"
+    s3.etag = '"2"'
+    assert recipe_cache.cached_file(s3, url, directory, *stamp)[1] == "downloaded"
+    s3.down = True
+    assert recipe_cache.cached_file(s3, url, directory, *stamp)[1] == "unchecked"
+    assert s3.downloads == 2
+
+
+def test_cached_file_refuses_another_format(tmp_path):
+    source = str(tmp_path / "built.idx")
+    recipe_index.write_index(source, [])
+    with pytest.raises(ValueError):
+        recipe_cache.cached_file(
+            FakeS3(source, '"1"'), "s3://bucket/recipes.snap", str(tmp_path), b"RBSN", 3
+        )
+    assert not (tmp_path / "recipes.snap").exists()
+
+
+def test_cached_file_replaces_a_copy_of_another_version(tmp_path, monkeypatch):
+    source = str(tmp_path / "built.idx")
+    directory = str(tmp_path / "cache")
+    url = "s3://bucket/recipes.idx"
+    stamp = (recipe_index.MAGIC, recipe_index.VERSION)
+    s3 = FakeS3(source, '"1"')
+    s3.down = True
+    with pytest.raises(ConnectionError):
+        recipe_cache.cached_file(s3, url, directory, *stamp)
+
+    # a copy left by an older release, under the ETag S3 still reports
+    monkeypatch.setattr(recipe_index, "VERSION", recipe_index.VERSION - 1)
+    recipe_index.write_index(source, [])
+    s3.down = False
+    old = (recipe_index.MAGIC, recipe_index.VERSION)
+    assert recipe_cache.cached_file(s3, url, directory, *old)[1] == "downloaded"
+    monkeypatch.undo()
+    recipe_index.write_index(source, [])
+
+    path, status = recipe_cache.cached_file(s3, url, directory, *stamp)
+    assert status == "downloaded"
+    assert recipe_index.read_header(path) == stamp
+    assert (tmp_path / "cache" / "recipes.idx.etag").read_text() == '"1"'
+    assert recipe_cache.cached_file(s3, url, directory, *stamp)[1] == "cached"
+    assert s3.downloads == 2
@@ -0,0 +1,99 @@
+import pytest
+
+import recipe_index
+
+RECIPES = [
+    {
+        "Id": "b2",
+        "title": "Chocolate Cake",
+        "title_terms": ["chocolate", "cake"],
+        "ner_terms": ["flour", "cocoa", "Sugar"],
+        "diet_mask": 5,
+        "n_ingredients": 3,
+        "directions_length": 120,
+    },
+    {
+        "Id": "a1",
+        "title": "Crème Brûlée",
+        "title_terms": ["crème", "brûlée"],
+        "ner_terms": ["cream", "sugar", "sugar", " "],
+        "diet_mask": 0,
+        "n_ingredients": 2,
+        "directions_length": 80,
+    },
+    {
+        "Id": "c3",
+        "title": "Chocolate Chip Cookies",
+        "title_terms": ["chocolate", "chip", "cooky"],
+        "ner_terms": ["flour", "chocolate chips"],
+        "diet_mask": 7,
+        "n_ingredients": 2,
+        "directions_length": 95,
+    },
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = str(tmp_path / "recipes.idx")
+    assert recipe_index.write_index(path, RECIPES) == 3
+    index = recipe_index.RecipeIndex(path)
+    yield index
+    index.close()
+
+
+def test_index_round_trip(index):
+    assert len(index) == 3
+    assert [index.recipe_id(o) for o in range(3)] == ["b2", "a1", "c3"]
+    assert index.title(1) == "Crème Brûlée"
+    assert index.diet_mask(2) == 7
+    assert index.features(0) == {
+        "diet_mask": 5,
+        "n_ingredients": 3,
+        "directions_length": 120,
+    }
+
+
+def test_index_postings(index):
+    assert index.postings("chocolate").tolist() == [0, 2]
+    assert index.postings("Chocolate").tolist() == [0, 2]
+    assert index.postings("brûlée").tolist() == [1]
+    assert index.postings("pie").tolist() == []
+    # ner terms are lowercased, stripped and counted once per recipe
+    assert index.postings("sugar", "ner").tolist() == [0, 1]
+    assert not index.has_term(" ", "ner")
+    assert index.document_frequency("flour", "ner") == 2
+    assert index.average_terms() == 7 / 3
+
+
+def test_index_search_intersects(index):
+    assert index.search(["chocolate", "cooky"]) == [2]
+    assert index.search(["chocolate", "crème"]) == []
+    assert index.search([]) == []
+
+
+def test_empty_index(tmp_path):
+    path = str(tmp_path / "empty.idx")
+    recipe_index.write_index(path, [])
+    index = recipe_index.RecipeIndex(path)
+    assert len(index) == 0
+    assert index.average_terms() == 0.0
+    assert index.search(["cake"]) == []
+    index.close()
+
+
+def test_another_version_is_refused(tmp_path, monkeypatch):
+    path = str(tmp_path / "recipes.idx")
+    monkeypatch.setattr(recipe_index, "VERSION", recipe_index.VERSION - 1)
+    recipe_index.write_index(path, RECIPES)
+    monkeypatch.undo()
+    assert recipe_index.read_header(path) == (b"RBIX", recipe_index.VERSION - 1)
+    with pytest.raises(ValueError, match="is not a version"):
+        recipe_index.RecipeIndex(path)
+
+
+def test_section_names_are_bounded(tmp_path):
+    with pytest.raises(ValueError, match="too long"):
+        recipe_index.write_sections(
+            str(tmp_path / "long.bin"), b"TEST", 1, [("x" * 9, b""), ("y" * 40, b"")]
+        )
@@ -0,0 +1,45 @@
+import pytest
+
+from recipe_keywords import split_keywords, stem
+
+# (singular, plural, term both map to)
+PAIRS = [
+    ("cookie", "cookies", "cooky"),
+    ("brownie", "brownies", "browny"),
+    ("berry", "berries", "berry"),
+    ("peach", "peaches", "peach"),
+    ("brioche", "brioches", "brioch"),
+    ("quiche", "quiches", "quich"),
+    ("ganache", "ganaches", "ganach"),
+    ("sandwich", "sandwiches", "sandwich"),
+    ("kiwi", "kiwis", "kiwi"),
+    ("chili", "chilis", "chili"),
+    ("tomato", "tomatoes", "tomato"),
+    ("glass", "glasses", "glass"),
+    ("dish", "dishes", "dish"),
+    ("box", "boxes", "box"),
+    ("muffin", "muffins", "muffin"),
+    ("cake", "cakes", "cake"),
+]
+
+NOT_PLURAL = ["hummus", "couscous", "glass", "pastis", "chablis", "tahini", "pie"]
+
+
+@pytest.mark.parametrize("singular, plural, term", PAIRS)
+def test_singular_and_plural_share_a_term(singular, plural, term):
+    assert stem(singular) == term
+    assert stem(plural) == term
+
+
+@pytest.mark.parametrize("word", NOT_PLURAL)
+def test_not_plural_words_are_kept(word):
+    assert stem(word) == word
+
+
+@pytest.mark.parametrize("word", [w for pair in PAIRS for w in pair[:2]] + NOT_PLURAL)
+def test_stem_is_idempotent(word):
+    assert stem(stem(word)) == stem(word)
+
+
+def test_split_keywords_stems_titles():
+    assert split_keywords("Peach Brioches and Kiwis") == ["peach", "brioch", "kiwi"]
@@ -0,0 +1,92 @@
+import pytest
+
+import recipe_index
+import recipe_snapshot
+
+
+def recipe(n, title):
+    return {
+        "Id": f"{n:04d}#{title.lower()}",
+        "title": title,
+        "link": f"www.example.com/{n}",
+        "source": "Gathered",
+        "ingredients": [f"{n} c. flour", "1 egg"],
+        "directions": ["Mix.", "Bake."],
+        "NER": ["flour", "egg"],
+        "rendered": ["- 1 egg"],
+        "diet_mask": n % 8,
+        "n_ingredients": 2,
+        "directions_length": 10 + n,
+    }
+
+
+TITLES = ["Chocolate Cake", "Crème Brûlée", "Chocolate Chip Cookies", "Pie", "Bread"]
+# written in an order that is not the Id order
+RECIPES = [recipe(n, title) for n, title in reversed(list(enumerate(TITLES)))]
+
+
+@pytest.fixture(params=[True, False], ids=["zlib", "plain"])
+def snapshot(request, tmp_path):
+    path = str(tmp_path / "recipes.snap")
+    count = recipe_snapshot.write_snapshot(
+        path, iter(RECIPES), compress=request.param, block_size=2
+    )
+    assert count == len(RECIPES)
+    snapshot = recipe_snapshot.RecipeSnapshot(path)
+    yield snapshot
+    snapshot.close()
+
+
+def test_snapshot_round_trip(snapshot):
+    assert len(snapshot) == len(RECIPES)
+    assert list(snapshot.iter_recipes()) == RECIPES
+    # reading backwards crosses blocks in the other direction
+    for ordinal in reversed(range(len(RECIPES))):
+        assert snapshot.recipe(ordinal) == RECIPES[ordinal]
+
+
+def test_snapshot_finds_ids(snapshot):
+    for ordinal, item in enumerate(RECIPES):
+        assert snapshot.find(item["Id"]) == ordinal
+    assert snapshot.find("0009#missing") is None
+    assert snapshot.find("") is None
+
+
+def test_snapshot_postings(snapshot):
+    chocolate = [RECIPES[o]["title"] for o in snapshot.postings("chocolate")]
+    assert sorted(chocolate) == ["Chocolate Cake", "Chocolate Chip Cookies"]
+    assert list(snapshot.postings("brûlée")) == [3]
+    assert list(snapshot.postings("waffle")) == []
+
+
+def test_empty_lists_survive(tmp_path):
+    path = str(tmp_path / "recipes.snap")
+    item = dict(recipe(0, "Water"), directions=[], rendered=None)
+    recipe_snapshot.write_snapshot(path, [item])
+    snapshot = recipe_snapshot.RecipeSnapshot(path)
+    assert snapshot.field(0, "directions") == []
+    assert snapshot.field(0, "rendered") == []
+    snapshot.close()
+
+
+def test_separator_in_a_list_item_is_refused():
+    with pytest.raises(ValueError):
+        recipe_snapshot.encode_list(["one\x1ftwo"])
+
+
+def test_another_version_is_refused(tmp_path, monkeypatch):
+    path = str(tmp_path / "recipes.snap")
+    monkeypatch.setattr(recipe_snapshot, "VERSION", recipe_snapshot.VERSION - 1)
+    recipe_snapshot.write_snapshot(path, RECIPES)
+    monkeypatch.undo()
+    assert recipe_snapshot.is_snapshot(path)
+    with pytest.raises(ValueError, match="is not a version"):
+        recipe_snapshot.RecipeSnapshot(path)
+
+
+def test_an_index_is_not_a_snapshot(tmp_path):
+    path = str(tmp_path / "recipes.idx")
+    recipe_index.write_index(path, [])
+    assert not recipe_snapshot.is_snapshot(path)
+    with pytest.raises(ValueError):
+        recipe_snapshot.RecipeSnapshot(path)
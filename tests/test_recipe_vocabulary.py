@@ -0,0 +1,68 @@
+import pytest
+
+import recipe_vocabulary
+
+COUNTS = {"chocolate": 40, "cooky": 90, "cake": 70, "bake": 5, "chicken": 30}
+
+
+@pytest.fixture
+def vocabulary(tmp_path):
+    path = str(tmp_path / "recipes.vocab")
+    recipe_vocabulary.write_vocabulary(path, COUNTS)
+    vocabulary = recipe_vocabulary.Vocabulary(path)
+    yield vocabulary
+    vocabulary.close()
+
+
+@pytest.mark.parametrize(
+    "word, term",
+    [
+        ("chocolate", "chocolate"),
+        ("cake", "cake"),
+        ("choclate", "chocolate"),
+        ("chocolatte", "chocolate"),
+        ("chocolabe", "chocolate"),
+        ("chocloate", "chocolate"),
+        ("chiken", "chicken"),
+        # "cokies" after stemming
+        ("coky", "cooky"),
+        # two edits away
+        ("choclat", None),
+        ("chikin", None),
+        # too short to correct
+        ("cak", None),
+    ],
+)
+def test_correct(vocabulary, word, term):
+    assert vocabulary.correct(word) == term
+
+
+def test_the_most_common_term_wins_a_tie(tmp_path):
+    path = str(tmp_path / "tie.vocab")
+    recipe_vocabulary.write_vocabulary(path, {"bake": 5, "cake": 70, "lake": 1})
+    vocabulary = recipe_vocabulary.Vocabulary(path)
+    assert vocabulary.correct("fake") == "cake"
+    vocabulary.close()
+
+
+def test_min_count_leaves_out_rare_terms(tmp_path):
+    path = str(tmp_path / "common.vocab")
+    assert recipe_vocabulary.write_vocabulary(path, COUNTS, min_count=10) == 4
+    vocabulary = recipe_vocabulary.Vocabulary(path)
+    assert "bake" not in vocabulary and "cake" in vocabulary
+    vocabulary.close()
+
+
+@pytest.mark.parametrize(
+    "a, b, distance",
+    [
+        ("cake", "cake", 0),
+        ("cake", "bake", 1),
+        ("cake", "ckae", 1),
+        ("cake", "cooky", 3),
+        ("chocolate", "cake", 3),
+    ],
+)
+def test_edit_distance(a, b, distance):
+    # past the limit only limit + 1 is reported
+    assert recipe_vocabulary.edit_distance(a, b, 2) == distance
@@ -0,0 +1,47 @@
+import pytest
+
+import request_metrics
+
+
+@pytest.fixture
+def records(monkeypatch):
+    flushed = []
+    monkeypatch.setattr(request_metrics, "_sink", flushed.append)
+    return flushed
+
+
+def collect():
+    metrics = request_metrics.start_request()
+    with metrics.stage("total"):
+        request_metrics.count("index_misses")
+        request_metrics.record("query", 2.5)
+    request_metrics.flush(Intent="AskForRecipe")
+    return metrics
+
+
+def test_a_request_flushes_one_record(records):
+    metrics = collect()
+    assert metrics.counters == {"index_misses": 1}
+    assert set(metrics.timings) == {"total", "query"}
+    (record,) = records
+    assert record["Intent"] == "AskForRecipe"
+    assert record["index_misses"] == 1
+    assert record["query_ms"] == 2.5
+    names = {m["Name"] for m in record["_aws"]["CloudWatchMetrics"][0]["Metrics"]}
+    assert names == {"total_ms", "query_ms", "index_misses"}
+
+
+def test_disabled_metrics_collect_nothing(records, monkeypatch):
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", False)
+    metrics = collect()
+    assert metrics.counters == {}
+    assert metrics.timings == {}
+    assert records == []
+
+
+def test_a_stage_still_raises_when_disabled(monkeypatch):
+    monkeypatch.setattr(request_metrics, "METRICS_ENABLED", False)
+    metrics = request_metrics.start_request()
+    with pytest.raises(KeyError):
+        with metrics.stage("total"):
+            raise KeyError("missing")
@@ -0,0 +1,240 @@
+import threading
+import time
+
+import pytest
+
+# more than the 200 recipes the cursor used to remember, and more than one
+# request's page budget reads
+MATCHES = 250
+
+
+@pytest.fixture
+def corpus(write_corpus):
+    titles = []
+    for n in range(MATCHES):
+        titles.append(f"Chocolate Cookies {n}")
+        # postings in one of the two keyword partitions that do not match
+        if n % 3 == 0:
+            titles.append(f"Chocolate Cake {n}")
+        if n % 4 == 0:
+            titles.append(f"Oatmeal Cookies {n}")
+    return write_corpus(titles)
+
+
+@pytest.fixture
+def handler(corpus, monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("PREWARM_CONNECTIONS", "false")
+    import bench_lambda
+    import lambda_function_askforrecipe as handler
+
+    client = bench_lambda.FakeDynamoDBClient()
+    bench_lambda.load_corpus(
+        client, handler.TABLE_NAME, handler.KEYWORD_TABLE_NAME, corpus, 0
+    )
+    monkeypatch.setattr(handler, "dynamodb_client", client)
+    monkeypatch.setattr(handler, "_query_cache", handler.QueryCache(0, 0))
+    monkeypatch.setattr(handler, "HOT_RECIPE_CACHE_MB", 0)
+    # small pages and budgets, so every search stops long before the last match
+    monkeypatch.setattr(handler, "QUERY_PAGE_SIZE", 20)
+    monkeypatch.setattr(handler, "MAX_QUERY_PAGES", 3)
+    monkeypatch.setattr(handler, "ENOUGH_CANDIDATES", 15)
+    monkeypatch.setattr(handler, "LOCAL_CANDIDATES", 30)
+    return handler
+
+
+def event(intent, attributes):
+    def slot(value):
+        return {"value": {"interpretedValue": value}}
+
+    return {
+        "sessionId": "test",
+        "invocationSource": "FulfillmentCodeHook",
+        "sessionState": {
+            "sessionAttributes": attributes,
+            "intent": {
+                "name": intent,
+                "slots": {
+                    "Item": slot("cookies"),
+                    "Flavor": slot("chocolate"),
+                    "DietaryRestrictions": slot("none"),
+                },
+            },
+        },
+    }
+
+
+def shown_until_no_more(handler):
+    """
+    ask again until the bot says there are no more, returns the recipe titles
+    shown and the most DynamoDB calls one request made
+    """
+    client = handler.dynamodb_client
+    shown = []
+    attributes = {}
+    most_calls = 0
+    for n in range(MATCHES * 3):
+        intent = "AnotherRecipe" if n % 2 else "AskforRecipe"
+        calls = client.calls
+        response = handler.lambda_handler(event(intent, attributes), None)
+        most_calls = max(most_calls, client.calls - calls)
+        attributes = response["sessionState"]["sessionAttributes"]
+        content = response["messages"][0]["content"]
+        if content.startswith("Sorry"):
+            assert "more" in content
+            assert handler.SEARCH_CURSOR_ATTRIBUTE not in attributes
+            return shown, most_calls
+        if not content.startswith("I haven't found"):
+            shown.append(content.splitlines()[0])
+    pytest.fail("asking again never ran out of recipes")
+
+
+def test_every_match_is_shown_once(handler):
+    shown, most_calls = shown_until_no_more(handler)
+    assert len(shown) == MATCHES
+    assert len(set(shown)) == MATCHES
+    # a follow-up reads on from the cursor: one page budget and one BatchGetItem
+    assert most_calls <= handler.MAX_QUERY_PAGES + 1
+
+
+def test_every_match_is_shown_once_with_local_index(
+    handler, corpus, tmp_path, monkeypatch
+):
+    import buildIndex
+    import recipe_index
+
+    path = str(tmp_path / "recipes.idx")
+    buildIndex.build_index(corpus, path)
+    monkeypatch.setattr(handler, "_recipe_index", recipe_index.RecipeIndex(path))
+    shown, _ = shown_until_no_more(handler)
+    assert len(shown) == MATCHES
+    assert len(set(shown)) == MATCHES
+
+
+def test_cursor_round_trips_through_the_session(handler):
+    cursor = handler.SearchCursor(
+        ["cooky", ["chocolate"], 0],
+        ["b", "c"],
+        {"t": "cooky", "k": "a#cooky"},
+        ["d"],
+        2,
+    )
+    loaded = handler.SearchCursor.loads(cursor.dumps())
+    assert loaded.query == ["cooky", ["chocolate"], 0]
+    assert loaded.ids == ["b", "c"]
+    assert loaded.position == {"t": "cooky", "k": "a#cooky"}
+    assert loaded.ahead == ["d"]
+    assert loaded.shown == 2
+    assert handler.SearchCursor(["cooky", [], 0]).position == {}
+    assert handler.SearchCursor.loads('{"q":[],"i":[],"s":""}') is None
+
+
+@pytest.mark.parametrize(
+    "state",
+    [
+        '"q"',
+        "[1, 2]",
+        '{"q":["cooky",["chocolate"]],"i":[],"p":{},"a":[],"n":0}',
+        '{"q":["cooky","chocolate",0],"i":[],"p":{},"a":[],"n":0}',
+        '{"q":[7,[],0],"i":[],"p":{},"a":[],"n":0}',
+        '{"q":["",[],0],"i":[],"p":{},"a":[],"n":0}',
+        '{"q":["cooky",[],"0"],"i":[],"p":{},"a":[],"n":0}',
+        '{"q":["cooky",[],4096],"i":[],"p":{},"a":[],"n":0}',
+        '{"q":["cooky",[],0],"i":"abc","p":{},"a":[],"n":0}',
+        '{"q":["cooky",[],0],"i":[1],"p":{},"a":[],"n":0}',
+        '{"q":["cooky",[],0],"i":[],"p":{"o":-1},"a":[],"n":0}',
+        '{"q":["cooky",[],0],"i":[],"p":{"t":"cooky"},"a":[],"n":0}',
+        '{"q":["cooky",[],0],"i":[],"p":[],"a":[],"n":0}',
+        '{"q":["cooky",[],0],"i":[],"p":{},"a":[null],"n":0}',
+        '{"q":["cooky",[],0],"i":[],"p":{},"a":[],"n":true}',
+    ],
+)
+def test_malformed_cursor_is_dropped(handler, state):
+    assert handler.SearchCursor.loads(state) is None
+
+
+def test_malformed_cursor_starts_a_new_search(handler):
+    attributes = {
+        handler.SEARCH_CURSOR_ATTRIBUTE: '{"q":"x","i":{},"p":{},"a":[],"n":"1"}'
+    }
+    response = handler.lambda_handler(event("AnotherRecipe", attributes), None)
+    assert response["messages"][0]["content"] == "Ask me for a recipe first."
+
+    response = handler.lambda_handler(event("AskforRecipe", attributes), None)
+    assert "Chocolate Cookies" in response["messages"][0]["content"]
+    cursor = handler.SearchCursor.loads(
+        response["sessionState"]["sessionAttributes"][handler.SEARCH_CURSOR_ATTRIBUTE]
+    )
+    assert cursor.query == ["cooky", ["chocolate"], 0]
+    assert cursor.shown == 1
+
+
+class StaggeredClient:
+    """
+    answers the queries of one keyword partition slower than the other, so
+    pages of a fanned out search arrive interleaved
+    """
+
+    def __init__(self, client, delays):
+        self.client = client
+        self.delays = delays
+        self.keywords = []
+        self.running = 0
+        self.most_running = 0
+        self.lock = threading.Lock()
+
+    def query(self, **params):
+        keyword = params["ExpressionAttributeValues"][":keyword"]["S"]
+        with self.lock:
+            self.keywords.append(keyword)
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        try:
+            time.sleep(self.delays.get(keyword, 0))
+            return self.client.query(**params)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+def postings(handler, position, exclude=()):
+    terms = handler.search_terms("cooky", ["chocolate"])
+    return handler.dynamodb_postings(
+        "cooky", ["chocolate"], [], handler.make_scorer(terms), position, exclude
+    )
+
+
+def test_fan_out_merges_both_partitions(handler, monkeypatch):
+    monkeypatch.setattr(handler, "ENOUGH_CANDIDATES", 10 * MATCHES)
+    monkeypatch.setattr(handler, "MAX_QUERY_PAGES", 100)
+    client = StaggeredClient(handler.dynamodb_client, {"cooky": 0.01})
+    monkeypatch.setattr(handler, "dynamodb_client", client)
+
+    scored, passed, position = postings(handler, {})
+    ids = [posting["recipe_id"] for _, posting in scored]
+    assert len(ids) == MATCHES
+    assert len(set(ids)) == MATCHES
+    assert all(p["title"].startswith("Chocolate Cookies") for _, p in scored)
+    # both first pages were in flight together and the faster partition ran out
+    assert client.most_running == 2
+    assert set(client.keywords) == {"cooky", "chocolate"}
+    assert position is None
+    assert set(ids) <= passed
+
+
+def test_resumed_search_reads_one_partition_on(handler, monkeypatch):
+    client = StaggeredClient(handler.dynamodb_client, {})
+    monkeypatch.setattr(handler, "dynamodb_client", client)
+
+    first, passed, position = postings(handler, {})
+    assert len(first) == handler.ENOUGH_CANDIDATES
+    assert position["t"] in ("cooky", "chocolate")
+
+    client.keywords.clear()
+    second, _, _ = postings(handler, position)
+    assert set(client.keywords) == {position["t"]}
+    first_ids = {posting["recipe_id"] for _, posting in first}
+    second_ids = {posting["recipe_id"] for _, posting in second}
+    assert second_ids
+    assert not second_ids & passed
+    assert not second_ids & first_ids
@@ -0,0 +1,135 @@
+TITLE = "Chocolate Chip Walnut Oatmeal Cookies"
+
+
+class FakeKeywordTable:
+    """
+    the batch_write_item of a DynamoDB resource over one in-memory table,
+    the call numbered fail_on raises
+    """
+
+    def __init__(self, fail_on=None):
+        self.items = {}
+        self.calls = 0
+        self.fail_on = fail_on
+        self.keys_per_call = []
+
+    def batch_write_item(self, RequestItems):
+        import streamIndexer
+
+        self.calls += 1
+        if self.calls == self.fail_on:
+            raise RuntimeError("keyword table unavailable")
+        requests = RequestItems[streamIndexer.target_table_name]
+        keys = []
+        for request in requests:
+            if "PutRequest" in request:
+                item = request["PutRequest"]["Item"]
+                self.items[item["Id"]] = item
+                keys.append(item["Id"])
+            else:
+                key = request["DeleteRequest"]["Key"]["Id"]
+                self.items.pop(key, None)
+                keys.append(key)
+        self.keys_per_call.append(keys)
+        return {"UnprocessedItems": {}}
+
+
+def recipe(recipe_id, title=TITLE, ner=("flour",)):
+    return {
+        "Id": recipe_id,
+        "title": title,
+        "ingredients": ["1 c. flour"],
+        "directions": ["Bake."],
+        "NER": list(ner),
+    }
+
+
+def record(sequence, event_name, old=None, new=None):
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+
+    def image(item):
+        return {key: serializer.serialize(value) for key, value in item.items()}
+
+    change = {"SequenceNumber": str(sequence), "Keys": {"Id": {"S": "x"}}}
+    if old is not None:
+        change["OldImage"] = image(old)
+    if new is not None:
+        change["NewImage"] = image(new)
+    return {"eventID": str(sequence), "eventName": event_name, "dynamodb": change}
+
+
+def postings(*recipes):
+    import createKeywords
+
+    return {p["Id"]: p for r in recipes for p in createKeywords.keyword_items(r)}
+
+
+def handle(monkeypatch, table, records):
+    import dynamoUtils
+    import streamIndexer
+
+    monkeypatch.setattr(dynamoUtils, "thread_resource", lambda: table)
+    return streamIndexer.lambda_handler({"Records": records}, None)
+
+
+def test_batch_ends_in_the_postings_of_the_last_images(monkeypatch):
+    modified = recipe("a", title="Oatmeal Raisin Cookies", ner=("eggs",))
+    records = [
+        record(1, "INSERT", new=recipe("a")),
+        record(2, "INSERT", new=recipe("b")),
+        record(3, "MODIFY", old=recipe("a"), new=modified),
+        record(4, "REMOVE", old=recipe("b")),
+    ]
+    table = FakeKeywordTable()
+    assert handle(monkeypatch, table, records) == {"batchItemFailures": []}
+    assert table.items == postings(modified)
+    # writes are coalesced, no key is sent twice
+    sent = [key for keys in table.keys_per_call for key in keys]
+    assert len(sent) == len(set(sent))
+
+
+def test_replaying_a_batch_is_idempotent(monkeypatch):
+    records = [
+        record(1, "INSERT", new=recipe("a")),
+        record(2, "INSERT", new=recipe("b")),
+        record(3, "REMOVE", old=recipe("a")),
+    ]
+    table = FakeKeywordTable()
+    handle(monkeypatch, table, records)
+    applied = dict(table.items)
+    assert handle(monkeypatch, table, records) == {"batchItemFailures": []}
+    assert table.items == applied == postings(recipe("b"))
+
+
+def test_failed_write_reports_the_first_record_not_written(monkeypatch):
+    import dynamoUtils
+
+    # 20 postings per recipe, so the writes go out as a[20] + b[5], b[15] +
+    # c[10] and c[10]; the second call fails
+    records = [record(n, "INSERT", new=recipe(name)) for n, name in enumerate("abc")]
+    assert len(postings(recipe("a"))) == 20
+    assert dynamoUtils.max_batch_size == 25
+    table = FakeKeywordTable(fail_on=2)
+    response = handle(monkeypatch, table, records)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "1"}]}
+    assert set(postings(recipe("a"))) <= set(table.items)
+
+    # lambda retries the batch from the reported record on
+    table.fail_on = None
+    assert handle(monkeypatch, table, records[1:]) == {"batchItemFailures": []}
+    assert table.items == postings(recipe("a"), recipe("b"), recipe("c"))
+
+
+def test_unreadable_record_fails_the_batch_from_that_record(monkeypatch):
+    records = [
+        record(1, "INSERT", new=recipe("a")),
+        record(2, "INSERT", new={"Id": "b"}),
+        record(3, "INSERT", new=recipe("c")),
+    ]
+    table = FakeKeywordTable()
+    response = handle(monkeypatch, table, records)
+    assert response == {"batchItemFailures": [{"itemIdentifier": "2"}]}
+    # the records before it are written
+    assert table.items == postings(recipe("a"))